@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from src.models.db_session import get_db
 from src.models.schemas import ConversationRequest, ConversationResponse
@@ -9,10 +10,12 @@ from typing import Optional
 router = APIRouter()
 
 @router.post("/message", response_model=ConversationResponse)
-async def process_conversation_message(
+def process_conversation_message(
     request: ConversationRequest,
     db: Session = Depends(get_db)
 ):
+    # Plain def: the orchestrator (LLM calls + DB writes) is blocking, so FastAPI
+    # runs this in its threadpool instead of stalling the event loop
     try:
         orchestrator = ConversationOrchestrator(db)
         
@@ -24,8 +27,10 @@ async def process_conversation_message(
             customer_phone=request.customer_phone,
             session_id=request.session_id
         )
-        
-        return response
+
+        # The orchestrator builds responses with model_construct (no validation);
+        # validate once here at the API boundary
+        return ConversationResponse.model_validate(dict(response))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -81,7 +86,7 @@ async def process_voice_message(
         # Transcribe audio using SINGLETON service (model already loaded)
         print("Starting transcription...")
         transcription_service = get_transcription_service()
-        transcription_result = transcription_service.transcribe_from_bytes(
+        transcription_result = await transcription_service.atranscribe_from_bytes(
             audio_bytes=audio_bytes,
             filename=audio.filename,
             language=language
@@ -105,9 +110,11 @@ async def process_voice_message(
                 detail="Transcription resulted in empty text. Please speak more clearly."
             )
         
-        # Process conversation
+        # Process conversation; the orchestrator (LLM calls + DB writes) is
+        # blocking, so run it in the threadpool rather than on the event loop
         orchestrator = ConversationOrchestrator(db)
-        response = orchestrator.process_message(
+        response = await run_in_threadpool(
+            orchestrator.process_message,
             message=transcribed_text,
             customer_phone=customer_phone,
             session_id=session_id,
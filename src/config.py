@@ -13,6 +13,8 @@ class Settings(BaseSettings):
     # Whisper model size: tiny, base, small, medium, large
     # 'base' is default, use 'small' or 'medium' for better Arabic accuracy
     whisper_model_size: str = Field(default="base", alias="WHISPER_MODEL_SIZE")
+    # torch.compile the openai-whisper decoder on CUDA (slower startup, faster decoding)
+    whisper_torch_compile: bool = Field(default=False, alias="WHISPER_TORCH_COMPILE")
     database_url: str = "sqlite:///./data/customer_service.db"
     max_retries: int = 3
     request_timeout: int = 10
@@ -4,6 +4,7 @@ import random
 from datetime import datetime, timedelta
 from src.models.database import Customer, MenuItem, Order, OrderItem, Issue, FAQ
 from src.models.enums import OrderStatus, IssueType, IssueStatus, Sentiment
+from src.utils import json_codec
 
 fake = Faker()
 
@@ -46,7 +47,6 @@ def generate_menu_items(db: Session):
         ]
     }
     
-    import json
     for brand, items in brands.items():
         for name, arabic_name, desc, price, category, dietary, allergens in items:
             item = MenuItem(
@@ -55,8 +55,8 @@ def generate_menu_items(db: Session):
                 description=desc,
                 price=price,
                 category=category,
-                dietary_tags=json.dumps(dietary),
-                allergens=json.dumps(allergens),
+                dietary_tags=json_codec.dumps(dietary),
+                allergens=json_codec.dumps(allergens),
                 is_available=True,
                 brand=brand
             )
@@ -66,7 +66,6 @@ def generate_menu_items(db: Session):
     print("✓ Menu items created for 2 brands")
 
 def generate_faqs(db: Session):
-    import json
     faqs = [
         # Hours & Location
         ("What are your hours?", "We're open Monday-Friday 11am-10pm, Saturday-Sunday 10am-11pm.", "hours", ["hours", "open", "time", "ساعات", "متى"]),
@@ -100,7 +99,7 @@ def generate_faqs(db: Session):
             question=question,
             answer=answer,
             category=category,
-            keywords=json.dumps(keywords),
+            keywords=json_codec.dumps(keywords),
             usage_count=0
         )
         db.add(faq)
@@ -1,14 +1,22 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from src.api.routes import conversation, customer
 from src.models.db_session import init_db
+from src.utils import json_codec
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Customer Service Agent API", version="1.0.0")
+# orjson encodes response bodies (largely non-ASCII Arabic text) straight to UTF-8
+# bytes in C, without the stdlib encoder's escaping pass
+app = FastAPI(
+    title="Customer Service Agent API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse if json_codec.orjson is not None else JSONResponse
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -65,8 +73,8 @@ async def preload_models():
     # Preload Whisper model (singleton)
     try:
         from src.services.voice_transcription import get_transcription_service
-        get_transcription_service()
-        print("✓ Whisper model loaded")
+        await get_transcription_service().awarmup()
+        print("✓ Whisper model loaded and warmed up")
     except Exception as e:
         logger.warning(f"Failed to preload Whisper: {e}")
     
@@ -1,9 +1,8 @@
-from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, ForeignKey, Enum as SQLEnum, Integer
+from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, ForeignKey, Enum as SQLEnum, Integer, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 import uuid
-import json
 from .enums import OrderStatus, IssueType, IssueStatus, Sentiment, ConversationState
 
 Base = declarative_base()
@@ -58,6 +57,11 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Order tracking fetches the customer's latest order
+    __table_args__ = (
+        Index("ix_orders_customer_created", "customer_id", "created_at"),
+    )
+    
     customer = relationship("Customer", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     issues = relationship("Issue", back_populates="order")
@@ -101,12 +105,22 @@ class Session(Base):
     channel = Column(String, default="voice")
     conversation_history = Column(Text, default="[]")
     current_order_draft = Column(Text)
-    conversation_state = Column(SQLEnum(ConversationState), default=ConversationState.GREETING)
+    conversation_state = Column(
+        SQLEnum(ConversationState),
+        nullable=False,
+        default=ConversationState.GREETING,
+        server_default=ConversationState.GREETING.name
+    )
     unclear_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = Column(DateTime, default=lambda: datetime.utcnow() + timedelta(hours=2))
     
+    # Active-session lookup by customer runs on every turn without a session_id
+    __table_args__ = (
+        Index("ix_sessions_customer_expires", "customer_id", "expires_at"),
+    )
+    
     customer = relationship("Customer", back_populates="sessions")
 
 class FAQ(Base):
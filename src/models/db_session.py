@@ -4,6 +4,12 @@ from sqlalchemy.pool import QueuePool
 from .database import Base
 from ..config import settings
 
+# psycopg2 (the default PostgreSQL driver) can batch executemany statements; SQLAlchemy
+# already batches INSERTs, "values_plus_batch" extends it to the UPDATEs on flush
+_driver_kwargs = {}
+if settings.database_url.startswith(("postgresql://", "postgresql+psycopg2://")):
+    _driver_kwargs["executemany_mode"] = "values_plus_batch"
+
 # Optimized connection pooling for better performance
 engine = create_engine(
     settings.database_url,
@@ -13,7 +19,8 @@ engine = create_engine(
     max_overflow=20,  # Additional connections when needed
     pool_pre_ping=True,  # Verify connections before using
     pool_recycle=3600,  # Recycle connections after 1 hour
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
+    **_driver_kwargs
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
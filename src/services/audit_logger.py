@@ -1,14 +1,60 @@
 from sqlalchemy.orm import Session
 from src.models.database import AuditLog
+from src.utils import json_codec
 from datetime import datetime
-import json
 from typing import Optional, Dict
 
 class AuditLogger:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, max_pending: int = 64):
         self.db = db
+        self.max_pending = max_pending
+        self._pending = []  # Rows queued with enqueue(), written by flush()
+    
+    def _build_entry(
+        self,
+        action: str,
+        customer_id: Optional[str],
+        session_id: Optional[str],
+        details: Optional[Dict],
+        performed_by: str,
+        severity: str
+    ) -> Dict:
+        # Audit rows are append-only and never read back through the ORM, so
+        # they are written as plain Core rows without identity-map bookkeeping
+        return {
+            "action": action,
+            "customer_id": str(customer_id) if customer_id else None,
+            "session_id": str(session_id) if session_id else None,
+            "details": json_codec.dumps(details or {}),
+            "performed_by": performed_by,
+            "severity": severity,
+            "timestamp": datetime.utcnow()
+        }
     
     def log(
+        self,
+        action: str,
+        customer_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        details: Dict = None,
+        performed_by: str = "system",
+        severity: str = "info",
+        commit: bool = True
+    ):
+        """Record an audit event
+        
+        Args:
+            commit: Commit immediately. Pass False to let the entry ride on the
+                caller's next commit instead of paying for a separate one.
+        """
+        self.db.execute(
+            AuditLog.__table__.insert(),
+            [self._build_entry(action, customer_id, session_id, details, performed_by, severity)]
+        )
+        if commit:
+            self.db.commit()
+    
+    def enqueue(
         self,
         action: str,
         customer_id: Optional[str] = None,
@@ -17,14 +63,31 @@ class AuditLogger:
         performed_by: str = "system",
         severity: str = "info"
     ):
-        log_entry = AuditLog(
-            action=action,
-            customer_id=str(customer_id) if customer_id else None,
-            session_id=str(session_id) if session_id else None,
-            details=json.dumps(details or {}),
-            performed_by=performed_by,
-            severity=severity,
-            timestamp=datetime.utcnow()
+        """Queue an audit event; nothing touches the DB session until flush()
+        
+        Once max_pending events are queued they are written to the current
+        transaction (without committing), so the queue stays bounded and the
+        entries ride on the caller's next commit.
+        """
+        self._pending.append(
+            self._build_entry(action, customer_id, session_id, details, performed_by, severity)
         )
-        self.db.add(log_entry)
-        self.db.commit()
+        if len(self._pending) >= self.max_pending:
+            self.flush(commit=False)
+    
+    def flush(self, commit: bool = True) -> int:
+        """Write all queued audit events in one batch
+        
+        Args:
+            commit: Commit after inserting. Pass False when the caller commits next.
+        
+        Returns:
+            Number of events written
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, []
+        self.db.execute(AuditLog.__table__.insert(), pending)
+        if commit:
+            self.db.commit()
+        return len(pending)
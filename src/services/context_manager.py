@@ -2,14 +2,68 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from src.models.database import Session as SessionModel, Customer
 from src.models.enums import ConversationState
+from src.utils import json_codec
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import uuid
-import json
 from typing import Optional, Dict, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+def load_order_draft(session: SessionModel) -> Optional[Dict]:
+    """Parse the session's order draft, reusing the cached parse while the stored string is unchanged
+    
+    The returned dict is shared with the cache; callers that modify it must copy it first.
+    
+    Raises:
+        json_codec.JSONDecodeError: If the stored draft is not valid JSON
+    """
+    raw = session.current_order_draft
+    if not raw:
+        return None
+    
+    cached = getattr(session, "_order_draft_cache", None)
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+    
+    draft = json_codec.loads(raw)
+    session._order_draft_cache = (raw, draft)
+    return draft
+
+
+def store_order_draft(session: SessionModel, order_draft: Dict) -> None:
+    """Serialize the order draft onto the session and cache the parsed form (no commit)"""
+    serialized = json_codec.dumps(order_draft)
+    session.current_order_draft = serialized
+    session._order_draft_cache = (serialized, order_draft)
+
+
+def load_history(session: SessionModel) -> List[Dict]:
+    """Parse the session's conversation history, reusing the cached parse while the stored string is unchanged
+    
+    The returned list is shared with the cache; callers that modify it must copy it first.
+    
+    Raises:
+        json_codec.JSONDecodeError: If the stored history is not valid JSON
+    """
+    raw = session.conversation_history or "[]"
+    cached = getattr(session, "_history_cache", None)
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+    
+    history = json_codec.loads(raw)
+    session._history_cache = (raw, history)
+    return history
+
+
+def store_history(session: SessionModel, history: List[Dict]) -> None:
+    """Serialize the history onto the session and cache the parsed form (no commit)"""
+    serialized = json_codec.dumps(history)
+    session.conversation_history = serialized
+    session._history_cache = (serialized, history)
+
+
 class ContextManager:
     """Manages conversation context and session state
     
@@ -30,11 +84,66 @@ class ContextManager:
             self.db = db
             self.max_history_messages = 20  # Reduced for speed (was 50)
             self.max_message_length = 2000  # Reduced for memory efficiency
+            self.duplicate_window_seconds = 5  # Client retries within this window are ignored
+            self._batch_depth = 0  # >0 while inside batch(); commits are deferred
             logger.info("ContextManager initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize ContextManager: {e}")
             raise
     
+    def _commit(self):
+        """Commit now, or defer to the end of the enclosing batch()"""
+        if self._batch_depth == 0:
+            self.db.commit()
+    
+    @contextmanager
+    def batch(self):
+        """Coalesce state/history/draft writes into a single commit
+        
+        Usage:
+            with context_manager.batch():
+                context_manager.update_conversation_state(session, state)
+                context_manager.add_message_to_history(session, "assistant", text)
+        
+        Nothing is committed if the block raises.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0:
+            try:
+                self.db.commit()
+            except SQLAlchemyError as e:
+                logger.error(f"Database error committing batched context writes: {e}")
+                self.db.rollback()
+                raise
+    
+    def commit(
+        self,
+        session: SessionModel,
+        *,
+        state: Optional[ConversationState] = None,
+        message: Optional[tuple] = None,
+        clear_draft: bool = False
+    ):
+        """Apply several context changes with a single commit
+        
+        Args:
+            session: Current session
+            state: New conversation state, if changing
+            message: (role, content) to append to history, if any
+            clear_draft: Clear the current order draft
+        """
+        with self.batch():
+            if clear_draft:
+                self.clear_order_draft(session)
+            if state is not None:
+                self.update_conversation_state(session, state)
+            if message is not None:
+                self.add_message_to_history(session, *message)
+    
     def get_or_create_session(
         self,
         customer_phone: str,
@@ -154,11 +263,13 @@ class ContextManager:
             
             # Load and validate history
             try:
-                history = json.loads(session.conversation_history or "[]")
+                history = load_history(session)
                 if not isinstance(history, list):
                     logger.warning("Invalid history format, resetting")
                     history = []
-            except json.JSONDecodeError:
+                else:
+                    history = list(history)
+            except json_codec.JSONDecodeError:
                 logger.error("Failed to decode conversation history, resetting")
                 history = []
             
@@ -177,9 +288,9 @@ class ContextManager:
                 logger.debug(f"Pruned history to {len(history)} messages")
             
             # Save back to session
-            session.conversation_history = json.dumps(history)
+            store_history(session, history)
             session.updated_at = datetime.utcnow()
-            self.db.commit()
+            self._commit()
         
         except SQLAlchemyError as e:
             logger.error(f"Database error adding message to history: {e}")
@@ -189,14 +300,41 @@ class ContextManager:
             logger.error(f"Error adding message to history: {e}")
             raise
     
+    def is_duplicate_message(
+        self,
+        session: SessionModel,
+        role: str,
+        content: str
+    ) -> bool:
+        """Check whether the same message was just appended (e.g. a client retry)
+        
+        Args:
+            session: Current session
+            role: Message role (user/assistant)
+            content: Message content
+        
+        Returns:
+            True if the last history entry matches and is within the retry window
+        """
+        history = self.get_conversation_history(session, limit=1)
+        if not history:
+            return False
+        last = history[-1]
+        if last.get("role") != role or last.get("content") != content:
+            return False
+        try:
+            age = datetime.utcnow() - datetime.fromisoformat(last["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return age.total_seconds() < self.duplicate_window_seconds
+    
     def get_recent_context(
         self,
         session: SessionModel,
         num_messages: int = 10
     ) -> list:
         """Get recent conversation context for better agent responses"""
-        history = json.loads(session.conversation_history or "[]")
-        return history[-num_messages:] if len(history) > num_messages else history
+        return load_history(session)[-num_messages:]
     
     def get_conversation_history(
         self,
@@ -204,8 +342,8 @@ class ContextManager:
         limit: int = 10
     ) -> list:
         """Get conversation history with optional limit"""
-        history = json.loads(session.conversation_history or "[]")
-        return history[-limit:] if limit and len(history) > limit else history
+        history = load_history(session)
+        return history[-limit:] if limit else list(history)
     
     def update_conversation_state(
         self,
@@ -214,7 +352,7 @@ class ContextManager:
     ):
         session.conversation_state = new_state
         session.updated_at = datetime.utcnow()
-        self.db.commit()
+        self._commit()
     
     def update_order_draft(
         self,
@@ -239,9 +377,9 @@ class ContextManager:
                 logger.warning("Order draft missing 'items' key")
                 order_draft["items"] = []
             
-            session.current_order_draft = json.dumps(order_draft)
+            store_order_draft(session, order_draft)
             session.updated_at = datetime.utcnow()
-            self.db.commit()
+            self._commit()
             logger.debug(f"Updated order draft for session {session.id}")
         
         except SQLAlchemyError as e:
@@ -252,6 +390,21 @@ class ContextManager:
             logger.error(f"Error updating order draft: {e}")
             raise
     
+    def get_order_draft(self, session: SessionModel) -> Optional[Dict]:
+        """Get the deserialized order draft, reusing the cached parse when unchanged
+        
+        Args:
+            session: Current session
+        
+        Returns:
+            Order draft dictionary, or None if there is no (valid) draft
+        """
+        try:
+            return load_order_draft(session)
+        except (json_codec.JSONDecodeError, TypeError):
+            logger.warning(f"Invalid order draft for session {session.id}")
+            return None
+    
     def clear_order_draft(self, session: SessionModel):
         """Clear current order draft
         
@@ -264,7 +417,7 @@ class ContextManager:
             
             session.current_order_draft = None
             session.updated_at = datetime.utcnow()
-            self.db.commit()
+            self._commit()
             logger.debug(f"Cleared order draft for session {session.id}")
         
         except SQLAlchemyError as e:
@@ -1,7 +1,14 @@
 from sqlalchemy.orm import Session
 from src.models.database import FAQ
-from typing import Optional, Dict
-import json
+from src.utils import json_codec
+from typing import Optional, Dict, Tuple
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def _parse_keywords(raw: str) -> Tuple[str, ...]:
+    """Parse a FAQ's keywords column once; keyed on the raw JSON, so edits re-parse"""
+    return tuple(json_codec.loads(raw))
 
 class FAQSearch:
     def __init__(self, db: Session):
@@ -13,7 +20,7 @@ class FAQSearch:
         faqs = self.db.query(FAQ).all()
         
         for faq in faqs:
-            keywords = json.loads(faq.keywords)
+            keywords = _parse_keywords(faq.keywords)
             if any(keyword in query_lower for keyword in keywords):
                 faq.usage_count += 1
                 self.db.commit()
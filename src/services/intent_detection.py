@@ -4,7 +4,7 @@ from src.models.enums import IntentType, Sentiment
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from src.config import settings
-import json
+from src.utils import json_codec
 import re
 import logging
 
@@ -159,9 +159,9 @@ FORMAT: {{"intent":"X","confidence":0.9,"sentiment":"neutral","entities":{{}}}}"
             # Extract JSON from response
             json_match = re.search(r'\{.*\}', response, re.DOTALL)
             if json_match:
-                data = json.loads(json_match.group())
+                data = json_codec.loads(json_match.group())
             else:
-                data = json.loads(response)
+                data = json_codec.loads(response)
             
             # Validate and extract fields with defaults
             intent_str = data.get("intent", "unclear")
@@ -196,7 +196,7 @@ FORMAT: {{"intent":"X","confidence":0.9,"sentiment":"neutral","entities":{{}}}}"
                 entities=entities,
                 sentiment=sentiment
             )
-        except json.JSONDecodeError as e:
+        except json_codec.JSONDecodeError as e:
             logger.error(f"JSON parsing failed: {e}. Response: {response[:200]}")
             return IntentResult(
                 intent=IntentType.UNCLEAR,
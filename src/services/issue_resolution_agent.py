@@ -5,11 +5,31 @@ from src.models.enums import IssueType, IssueStatus, Sentiment
 from src.services.resolution_policies import PolicyEngine
 from src.services.audit_logger import AuditLogger
 from datetime import datetime
+from src.utils.arabic import keyword_pattern, normalize_arabic
 from typing import Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+# Issue keywords (Arabic variants + English), checked in priority order;
+# hamza/taa-marbuta/diacritic spellings collapse under normalize_arabic
+_ISSUE_TYPE_PATTERNS = (
+    (keyword_pattern("ناقص", "مافي", "ما في", "نسيتوا", "ما جاء", "ما جا",
+                     "missing", "didn't get", "forgot", normalize=True), IssueType.MISSING_ITEM),
+    (keyword_pattern("غلط", "خطأ", "غير صحيح", "مو صحيح",
+                     "wrong", "incorrect", "mistake", normalize=True), IssueType.WRONG_ORDER),
+    (keyword_pattern("متأخر", "تأخر", "بطيء", "وين الطلب",
+                     "late", "slow", "delay", "waiting", normalize=True), IssueType.LATE_DELIVERY),
+    (keyword_pattern("بارد", "سيء", "رديء", "مو حلو",
+                     "cold", "quality", "bad", "terrible", normalize=True), IssueType.QUALITY),
+)
+
+_NEGATIVE_WORDS_RE = keyword_pattern("terrible", "awful", "disgusting", "angry", "disappointed",
+                                     "سيء", "رديء", "زعلان", "غاضب", "محبط", normalize=True)
+_POSITIVE_WORDS_RE = keyword_pattern("thanks", "thank you", "appreciate", "great",
+                                     "شكراً", "شكرا", "ممتاز", "جيد", "رائع", normalize=True)
+
 class IssueResolutionAgent:
     """Specialized agent for handling customer complaints and issues
     
@@ -166,33 +186,20 @@ class IssueResolutionAgent:
             }
     
     def _classify_issue(self, message: str) -> IssueType:
-        message_lower = message.lower()
-        
-        arabic_missing = ["ناقص", "مافي", "ما في", "نسيتوا", "ما جاء", "ما جا"]
-        arabic_wrong = ["غلط", "خطأ", "غير صحيح", "مو صحيح"]
-        arabic_late = ["متأخر", "تأخر", "بطيء", "وين الطلب"]
-        arabic_quality = ["بارد", "سيء", "رديء", "مو حلو"]
+        normalized = normalize_arabic(message)
         
-        if any(word in message_lower for word in arabic_missing + ["missing", "didn't get", "forgot"]):
-            return IssueType.MISSING_ITEM
-        elif any(word in message_lower for word in arabic_wrong + ["wrong", "incorrect", "mistake"]):
-            return IssueType.WRONG_ORDER
-        elif any(word in message_lower for word in arabic_late + ["late", "slow", "delay", "waiting"]):
-            return IssueType.LATE_DELIVERY
-        elif any(word in message_lower for word in arabic_quality + ["cold", "quality", "bad", "terrible"]):
-            return IssueType.QUALITY
-        else:
-            return IssueType.REFUND_REQUEST
+        for pattern, issue_type in _ISSUE_TYPE_PATTERNS:
+            if pattern.search(normalized):
+                return issue_type
+        return IssueType.REFUND_REQUEST
     
     def _detect_sentiment(self, message: str) -> Sentiment:
-        message_lower = message.lower()
+        normalized = normalize_arabic(message)
         
-        negative_words = ["terrible", "awful", "disgusting", "angry", "disappointed", "سيء", "رديء", "زعلان", "غاضب", "محبط"]
-        if any(word in message_lower for word in negative_words):
+        if _NEGATIVE_WORDS_RE.search(normalized):
             return Sentiment.NEGATIVE
         
-        positive_words = ["thanks", "thank you", "appreciate", "great", "شكراً", "شكرا", "ممتاز", "جيد", "رائع"]
-        if any(word in message_lower for word in positive_words):
+        if _POSITIVE_WORDS_RE.search(normalized):
             return Sentiment.POSITIVE
         
         return Sentiment.NEUTRAL
@@ -2,9 +2,10 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from src.models.database import MenuItem
 from src.services.faq_search import FAQSearch
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from typing import Callable, List, Dict, Optional
 import logging
-import json
+import threading
 import time
 from langchain_openai import ChatOpenAI
 from src.config import settings
@@ -21,6 +22,21 @@ _menu_cache = {
     "ttl": 300  # 5 minutes cache
 }
 
+# Rendered replies for the menu-backed inquiries (full menu, item search),
+# keyed by branch and query. They depend only on the query and the available
+# menu, so a repeated question skips the menu read and the formatting. Tagged
+# with the engine like the order agent's menu snapshot. FAQ answers are not
+# cached because a hit also bumps the FAQ's usage count.
+_reply_cache = {
+    "entries": OrderedDict(),
+    "bind": None,
+    "timestamp": 0,
+    "ttl": 300,  # same as the menu cache
+    "max_size": 256
+}
+# Guards _reply_cache: agents run in the request threadpool
+_reply_cache_lock = threading.Lock()
+
 def _get_menu_llm():
     """Get singleton LLM for menu agent"""
     global _menu_llm_instance
@@ -155,101 +171,138 @@ class MenuAgent:
 
 هذه الأطباق هي الأكثر طلباً من عملائنا! هل تريد تجربة أحدها؟"""
 
+    def _cached_reply(self, key: tuple, render: Callable[[], str]) -> str:
+        """Return the cached reply for key, rendering and storing it on a miss
+        
+        Exceptions from render propagate and nothing is stored, so error
+        replies are never served from the cache. Neither are replies rendered
+        without menu items (_get_cached_menu_items returns [] on DB errors).
+        """
+        current_time = time.time()
+        bind = self.db.get_bind()
+        entries = _reply_cache["entries"]
+        with _reply_cache_lock:
+            if _reply_cache["bind"] is not bind or (current_time - _reply_cache["timestamp"]) >= _reply_cache["ttl"]:
+                entries.clear()
+                _reply_cache["bind"] = bind
+                _reply_cache["timestamp"] = current_time
+            
+            reply = entries.get(key)
+            if reply is not None:
+                entries.move_to_end(key)
+                return reply
+        
+        # Rendering reads the database, so it runs outside the lock
+        reply = render()
+        if getattr(self, "_menu_cache", None):
+            with _reply_cache_lock:
+                if _reply_cache["bind"] is bind:
+                    entries[key] = reply
+                    if len(entries) > _reply_cache["max_size"]:
+                        entries.popitem(last=False)
+        return reply
+    
     def _get_full_menu(self) -> str:
         """Get full menu efficiently"""
         try:
-            # Get database items (limited for performance)
-            db_items = self._get_cached_menu_items()[:15]
-            
-            # Combine with static items
-            all_items = []
-            
-            # Add database items
-            for item in db_items:
-                all_items.append({
-                    "name": item.arabic_name or item.name,
-                    "price": item.price,
-                    "category": item.category
-                })
-            
-            # Add static popular items
-            for item in self.additional_menu_items[:8]:
-                all_items.append({
-                    "name": item["arabic_name"],
-                    "price": item["price"], 
-                    "category": item["category"]
-                })
-            
-            # Group by category
-            categories = {}
-            for item in all_items:
-                cat = item["category"]
-                if cat not in categories:
-                    categories[cat] = []
-                categories[cat].append(item)
-            
-            # Build response
-            response = "🍽️ منيو برجريزر:\n\n"
-            for category in sorted(categories.keys()):
-                response += f"📋 {category}:\n"
-                for item in categories[category][:4]:  # Limit per category
-                    response += f"• {item['name']} - {item['price']:.2f} SAR\n"
-                response += "\n"
-            
-            response += "يمكنك طلب أي من هذه الأطباق! 🍔"
-            return response
-            
+            return self._cached_reply(("menu",), self._render_full_menu)
         except Exception as e:
             logger.error(f"Error getting full menu: {e}")
             return "عذراً، حدث خطأ في تحميل المنيو. يرجى المحاولة مرة أخرى."
     
+    def _render_full_menu(self) -> str:
+        # Get database items (limited for performance)
+        db_items = self._get_cached_menu_items()[:15]
+        
+        # Combine with static items
+        all_items = []
+        
+        # Add database items
+        for item in db_items:
+            all_items.append({
+                "name": item.arabic_name or item.name,
+                "price": item.price,
+                "category": item.category
+            })
+        
+        # Add static popular items
+        for item in self.additional_menu_items[:8]:
+            all_items.append({
+                "name": item["arabic_name"],
+                "price": item["price"], 
+                "category": item["category"]
+            })
+        
+        # Group by category
+        categories = {}
+        for item in all_items:
+            cat = item["category"]
+            if cat not in categories:
+                categories[cat] = []
+            categories[cat].append(item)
+        
+        # Build response
+        parts = ["🍽️ منيو برجريزر:\n\n"]
+        for category in sorted(categories.keys()):
+            parts.append(f"📋 {category}:\n")
+            parts.extend(
+                f"• {item['name']} - {item['price']:.2f} SAR\n"
+                for item in categories[category][:4]  # Limit per category
+            )
+            parts.append("\n")
+        
+        parts.append("يمكنك طلب أي من هذه الأطباق! 🍔")
+        return "".join(parts)
+    
     def _search_menu(self, query: str) -> str:
         """Search menu items and format response"""
         try:
-            query_lower = query.lower()
-            matches = []
-            
-            # Search database items
-            items = self._get_cached_menu_items()
-            for item in items:
-                if (query_lower in item.name.lower() or 
-                    query_lower in (item.arabic_name or "").lower() or
-                    query_lower in item.category.lower()):
-                    matches.append({
-                        "name": item.arabic_name or item.name,
-                        "price": item.price,
-                        "category": item.category
-                    })
-            
-            # Search static items
-            for item in self.additional_menu_items:
-                if (query_lower in item["name"].lower() or
-                    query_lower in item["arabic_name"].lower() or
-                    query_lower in item["category"].lower()):
-                    matches.append({
-                        "name": item["arabic_name"],
-                        "price": item["price"],
-                        "category": item["category"]
-                    })
-            
-            # Format response
-            if not matches:
-                return f"لم أجد '{query}' في المنيو. جرب البحث عن: برجر، دجاج، بطاطس، سلطة"
-            
-            if len(matches) == 1:
-                item = matches[0]
-                return f"✅ {item['name']} متوفر بسعر {item['price']:.2f} SAR"
-            
-            response = f"🔍 نتائج البحث عن '{query}':\n\n"
-            for idx, item in enumerate(matches[:5], 1):
-                response += f"{idx}. {item['name']} - {item['price']:.2f} SAR\n"
-            
-            return response
-            
+            return self._cached_reply(("search", query), lambda: self._render_search(query))
         except Exception as e:
             logger.error(f"Error searching menu: {e}")
             return "عذراً، حدث خطأ في البحث. جرب مرة أخرى."
     
+    def _render_search(self, query: str) -> str:
+        query_lower = query.lower()
+        matches = []
+        
+        # Search database items
+        items = self._get_cached_menu_items()
+        for item in items:
+            if (query_lower in item.name.lower() or 
+                query_lower in (item.arabic_name or "").lower() or
+                query_lower in item.category.lower()):
+                matches.append({
+                    "name": item.arabic_name or item.name,
+                    "price": item.price,
+                    "category": item.category
+                })
+        
+        # Search static items
+        for item in self.additional_menu_items:
+            if (query_lower in item["name"].lower() or
+                query_lower in item["arabic_name"].lower() or
+                query_lower in item["category"].lower()):
+                matches.append({
+                    "name": item["arabic_name"],
+                    "price": item["price"],
+                    "category": item["category"]
+                })
+        
+        # Format response
+        if not matches:
+            return f"لم أجد '{query}' في المنيو. جرب البحث عن: برجر، دجاج، بطاطس، سلطة"
+        
+        if len(matches) == 1:
+            item = matches[0]
+            return f"✅ {item['name']} متوفر بسعر {item['price']:.2f} SAR"
+        
+        lines = "".join(
+            f"{idx}. {item['name']} - {item['price']:.2f} SAR\n"
+            for idx, item in enumerate(matches[:5], 1)
+        )
+        return f"🔍 نتائج البحث عن '{query}':\n\n{lines}"
+    
     def _get_restaurant_info(self, info_type: str) -> str:
         """Get restaurant information by type"""
         if info_type == "location":
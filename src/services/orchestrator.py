@@ -9,12 +9,170 @@ from src.services.order_processing_agent import OrderProcessingAgent
 from src.services.issue_resolution_agent import IssueResolutionAgent
 from src.services.audit_logger import AuditLogger
 from src.config import settings
-from typing import Optional
-import json
+from contextlib import contextmanager
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Final, Optional
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Arabic block; the scan runs in the regex engine instead of a Python loop
+_ARABIC_RE: Final = re.compile(r'[\u0600-\u06FF]')
+
+# Static replies for branches whose text does not depend on the request
+_WELCOME_AR: Final = """مرحباً! أهلاً بك في خدمة برجريزر للطلبات.
+
+أنا هنا لمساعدتك في:
+- تقديم طلب طعام
+- الاستفسار عن المنيو
+- تتبع طلبك
+- الإبلاغ عن مشكلة
+
+كيف يمكنني مساعدتك اليوم؟"""
+_WELCOME_EN: Final = """Welcome to Burgerizzer ordering service.
+
+I'm here to help you with:
+- Placing food orders
+- Menu inquiries
+- Tracking your order
+- Reporting issues
+
+How can I help you today?"""
+
+_GREETING_AR: Final = """مرحباً!  أهلاً بك في خدمة الطلبات.
+
+كيف يمكنني مساعدتك اليوم؟
+
+ تقديم طلب طعام
+ الاستفسار عن المنيو
+ تتبع طلبك
+ الإبلاغ عن مشكلة
+
+قل لي ماذا تحتاج!"""
+_GREETING_EN: Final = """Hello!  Welcome to our ordering service.
+
+How can I help you today?
+
+ Place a food order
+ Inquire about menu
+ Track your order
+ Report an issue
+
+Let me know what you need!"""
+
+_CANCEL_AR: Final = """✅ تم إلغاء الطلب السابق وبدء طلب جديد.
+
+📋 ماذا تريد أن تطلب اليوم؟"""
+_CANCEL_EN: Final = """✅ Previous order cancelled. New order started.
+
+📋 What would you like to order today?"""
+
+_ESCALATE_AR: Final = """جاري تحويلك إلى موظف خدمة العملاء...
+
+سيتواصل معك أحد ممثلينا قريباً لمساعدتك.
+
+شكراً لصبرك."""
+_ESCALATE_EN: Final = """Transferring you to a customer service representative...
+
+Thank you for your patience."""
+
+_FAREWELL_AR: Final = """شكراً لك! 
+
+أتمنى لك يوماً سعيداً. 
+إذا احتجت أي شيء، أنا هنا دائماً لمساعدتك!
+
+مع السلامة"""
+_FAREWELL_EN: Final = """Thank you!
+
+Have a great day!
+If you need anything else, I'm always here to help.
+
+Goodbye!"""
+
+_UNCLEAR_DEFAULT: Final = "أنا هنا لمساعدتك! يمكنك السؤال عن المنيو تقديم طلب، أو الإبلاغ عن مشكلة."
+
+# Index into the (Arabic, English) template tuples; unknown languages get English
+_LANG_IDX: Final = MappingProxyType({"ar": 0, "en": 1})
+
+_WELCOME_TEXTS: Final = (_WELCOME_AR, _WELCOME_EN)
+
+# Static (Arabic, English) replies keyed by intent, built once at import time
+_RESPONSE_TEMPLATES: Final = MappingProxyType({
+    IntentType.GREETING: (_GREETING_AR, _GREETING_EN),
+    IntentType.CANCEL: (_CANCEL_AR, _CANCEL_EN),
+    IntentType.ESCALATE: (_ESCALATE_AR, _ESCALATE_EN),
+    IntentType.FAREWELL: (_FAREWELL_AR, _FAREWELL_EN),
+})
+
+
+def _localized_template(intent: IntentType, language: str) -> str:
+    """Get the static reply for an intent; any non-Arabic language gets English"""
+    return _RESPONSE_TEMPLATES[intent][_LANG_IDX.get(language, 1)]
+
+def _make_response(session, intent_result: IntentResult, response_text: str, **extra) -> ConversationResponse:
+    """Build a response carrying the session's id/state and the detected intent
+    
+    Args:
+        session: Current session
+        intent_result: Detected intent (confidence and intent are copied)
+        response_text: Reply shown to the customer
+        **extra: Optional fields such as order_draft, order_cleared, order_number
+    """
+    return ConversationResponse.model_construct(
+        response=response_text,
+        session_id=session.id,
+        conversation_state=session.conversation_state,
+        confidence=intent_result.confidence,
+        intent=intent_result.intent,
+        **extra
+    )
+
+def _empty_draft() -> Dict:
+    """Fresh empty draft returned after a cancel (never shared between responses)"""
+    return {"items": [], "subtotal": 0, "tax": 0, "delivery_fee": 0, "total": 0}
+
+
+# Prebuilt (Arabic, English) replies for a critical routing error
+_ROUTE_FALLBACKS: Final = tuple(
+    ConversationResponse.model_construct(
+        response=text,
+        session_id="",
+        conversation_state=ConversationState.ENDED,
+        confidence=0.0,
+        intent=IntentType.ESCALATE
+    )
+    for text in (
+        "عذراً، حدث خطأ. دعني أحولك لموظف...",
+        "Sorry, error occurred. Let me transfer you..."
+    )
+)
+
+
+@lru_cache(maxsize=16)
+def _template_response(intent: IntentType, lang_idx: int) -> ConversationResponse:
+    """Prebuilt response for a static reply; per-session fields are filled on copy"""
+    return ConversationResponse.model_construct(
+        response=_RESPONSE_TEMPLATES[intent][lang_idx],
+        session_id="",
+        conversation_state=ConversationState.GREETING,
+        confidence=0.0,
+        intent=intent
+    )
+
+
+def _make_template_response(session, intent_result: IntentResult, language: str) -> ConversationResponse:
+    """Copy the prebuilt static response for this intent/language with the session's fields"""
+    update = {
+        "session_id": session.id,
+        "conversation_state": session.conversation_state,
+        "confidence": intent_result.confidence
+    }
+    if intent_result.intent == IntentType.CANCEL:
+        update["order_draft"] = _empty_draft()
+    return _template_response(intent_result.intent, _LANG_IDX.get(language, 1)).model_copy(update=update)
+
 
 class ConversationOrchestrator:
     """Main orchestrator for multi-agent conversation system
@@ -41,9 +199,24 @@ class ConversationOrchestrator:
             self.issue_agent = IssueResolutionAgent(db)
             self.audit_logger = AuditLogger(db)
             
+            # Intent -> handler dispatch table used by _route_to_agent
+            self._intent_handlers = {
+                IntentType.GREETING: self._handle_greeting,
+                IntentType.INQUIRY: self._handle_inquiry,
+                IntentType.ORDERING: self._handle_ordering,
+                IntentType.COMPLAINT: self._handle_complaint,
+                IntentType.TRACKING: self._handle_tracking,
+                IntentType.REMOVE: self._handle_remove,
+                IntentType.QUERY_ORDER: self._handle_query_order,
+                IntentType.CONFIRM_ORDER: self._handle_confirm_order,
+                IntentType.CANCEL: self._handle_cancel,
+                IntentType.ESCALATE: self._handle_escalate,
+                IntentType.FAREWELL: self._handle_farewell,
+            }
+            
             logger.info("ConversationOrchestrator initialized")
         except Exception as e:
-            logger.error(f"Failed to initialize ConversationOrchestrator: {e}")
+            logger.error("Failed to initialize ConversationOrchestrator: %s", e)
             raise
     
     def _sanitize_input(self, message: str) -> str:
@@ -51,9 +224,30 @@ class ConversationOrchestrator:
         message = ' '.join(message.split())
         return message.strip()
     
+    @contextmanager
+    def _agent_savepoint(self):
+        """Scope an agent call to a SAVEPOINT so a failure only discards its own work
+
+        Earlier writes in the same turn (e.g. the user message in history) survive.
+        Agents that commit internally end the savepoint themselves; in that case
+        a later failure falls back to a full rollback.
+        """
+        savepoint = self.db.begin_nested()
+        try:
+            yield
+        except Exception:
+            if savepoint.is_active:
+                savepoint.rollback()
+            else:
+                self.db.rollback()
+            raise
+        else:
+            if savepoint.is_active:
+                savepoint.commit()
+    
     def _has_arabic(self, text: str) -> bool:
         """Check if text contains Arabic characters"""
-        return any('\u0600' <= char <= '\u06FF' for char in text)
+        return _ARABIC_RE.search(text) is not None
     
     def process_message(
         self,
@@ -77,7 +271,7 @@ class ConversationOrchestrator:
             # Input validation
             if not message or not message.strip():
                 logger.warning("Empty message received")
-                return ConversationResponse(
+                return ConversationResponse.model_construct(
                     response="عذراً، لم أتلق أي رسالة. هل يمكنك إعادة المحاولة؟" if language == "ar" else "Sorry, I didn't receive your message. Can you try again?",
                     session_id=session_id or "",
                     conversation_state=ConversationState.GREETING,
@@ -96,26 +290,45 @@ class ConversationOrchestrator:
             try:
                 session = self.context_manager.get_or_create_session(customer_phone, session_id)
             except Exception as e:
-                logger.error(f"Session creation failed: {e}")
+                logger.error("Session creation failed: %s", e)
                 raise
             
-            # Add message to history
-            self.context_manager.add_message_to_history(session, "user", message)
+            # Add message to history (skip client retries of the same message)
+            if self.context_manager.is_duplicate_message(session, "user", message):
+                logger.info("Duplicate user message within retry window, not re-adding to history")
+            else:
+                self.context_manager.add_message_to_history(session, "user", message)
             
             # 🚀 OPTIMIZED: Direct processing without extra LLM analysis call
             # The intent detection already does classification - no need for separate query analysis
             try:
                 response = self._process_simple_query(message, session, language)
                 
-                # Add response to history
-                self.context_manager.add_message_to_history(session, "assistant", response.response)
+                # Handlers record their own reply; only add it here for paths that
+                # did not (clarifications, processing fallbacks) to avoid a duplicate
+                # history entry and a second write
+                if self.context_manager.is_duplicate_message(session, "assistant", response.response):
+                    self.audit_logger.flush()
+                else:
+                    # Audit events queued during this turn share the history commit
+                    self.audit_logger.flush(commit=False)
+                    self.context_manager.add_message_to_history(session, "assistant", response.response)
                 return response
                 
             except Exception as processing_error:
-                logger.warning(f"Query processing failed: {processing_error}")
+                logger.warning("Query processing failed: %s", processing_error)
+                # Keep audit events queued earlier in this turn (e.g. escalations);
+                # a failed DB write leaves the session needing a rollback first
+                try:
+                    if not self.db.is_active:
+                        self.db.rollback()
+                    self.audit_logger.flush()
+                except Exception as flush_error:
+                    logger.error("Failed to flush audit events: %s", flush_error)
+                    self.db.rollback()
                 # Return fallback response
                 fallback_msg = "عذراً، حدث خطأ. يرجى المحاولة مرة أخرى." if language == "ar" else "Sorry, an error occurred. Please try again."
-                return ConversationResponse(
+                return ConversationResponse.model_construct(
                     response=fallback_msg,
                     session_id=session.id,
                     conversation_state=session.conversation_state,
@@ -124,9 +337,9 @@ class ConversationOrchestrator:
                 )
         
         except Exception as e:
-            logger.error(f"Critical error in process_message: {e}", exc_info=True)
+            logger.error("Critical error in process_message: %s", e, exc_info=True)
             # Return safe fallback response
-            return ConversationResponse(
+            return ConversationResponse.model_construct(
                 response="عذراً، حدث خطأ غير متوقع. يرجى المحاولة مرة أخرى." if language == "ar" else "Sorry, an unexpected error occurred. Please try again.",
                 session_id=session_id or "",
                 conversation_state=ConversationState.GREETING,
@@ -137,28 +350,27 @@ class ConversationOrchestrator:
     def _process_simple_query(self, message: str, session, language: str = "ar") -> ConversationResponse:
         """Process a single query using the original orchestrator logic"""
         try:
-            # Get conversation history for context (OPTIMIZED: Only last 4 messages)
-            conversation_history_full = json.loads(session.conversation_history)
-            conversation_history = conversation_history_full[-4:] if len(conversation_history_full) > 4 else conversation_history_full
+            # Get conversation history for context (OPTIMIZED: only the last few messages)
+            # Stored history is already pruned on write, so this parse is bounded
+            conversation_history = self.context_manager.get_conversation_history(
+                session, limit=settings.max_history_context
+            )
             
             # Build session context for context-aware intent detection
             session_context = {
                 "has_order_draft": bool(session.current_order_draft),
                 "order_items_count": 0,
-                "conversation_state": session.conversation_state.value if session.conversation_state else "unknown"
+                "conversation_state": session.conversation_state.value
             }
-            if session.current_order_draft:
-                try:
-                    draft = json.loads(session.current_order_draft)
-                    session_context["order_items_count"] = len(draft.get("items", []))
-                except:
-                    pass
+            draft = self.context_manager.get_order_draft(session)
+            if draft:
+                session_context["order_items_count"] = len(draft.get("items", []))
             
             # Detect intent with fallback handling and context awareness
             try:
                 intent_result = self.intent_detection.detect(message, conversation_history, session_context)
             except Exception as e:
-                logger.error(f"Intent detection failed: {e}")
+                logger.error("Intent detection failed: %s", e)
                 # Fallback to unclear intent
                 intent_result = IntentResult(
                     intent=IntentType.UNCLEAR,
@@ -172,7 +384,7 @@ class ConversationOrchestrator:
                 return self._handle_unclear_intent(session, intent_result, language)
             
             # Reset unclear count on successful intent detection
-            if session.unclear_count and session.unclear_count > 0:
+            if session.unclear_count:
                 session.unclear_count = 0
                 self.db.commit()
             
@@ -180,9 +392,9 @@ class ConversationOrchestrator:
             return self._route_to_agent(intent_result, message, session, language)
             
         except Exception as e:
-            logger.error(f"Simple query processing failed: {e}")
+            logger.error("Simple query processing failed: %s", e)
             error_response = "عذراً، حدث خطأ. يرجى المحاولة مرة أخرى." if language == "ar" else "Sorry, an error occurred. Please try again."
-            return ConversationResponse(
+            return ConversationResponse.model_construct(
                 response=error_response,
                 session_id=session.id,
                 conversation_state=session.conversation_state,
@@ -192,17 +404,19 @@ class ConversationOrchestrator:
     
     def _handle_unclear_intent(self, session, intent_result, language: str) -> ConversationResponse:
         """Handle unclear intent with escalation tracking and smart clarification"""
-        session.unclear_count = (session.unclear_count or 0) + 1
+        # Read the column attribute once; the branches below use the local
+        unclear_count = session.unclear_count = (session.unclear_count or 0) + 1
         self.db.commit()
         
         # Provide context-aware clarification based on partial understanding
         partial_intent = intent_result.intent if intent_result.confidence > 0.3 else None
         
         if language == "ar":
-            if session.unclear_count == 1:
+            if unclear_count == 1:
                 # First attempt - be helpful and provide context
-                if partial_intent == IntentType.ORDERING:
-                    message = """عذراً، لم أفهم تماماً ما تريد طلبه. 
+                match partial_intent:
+                    case IntentType.ORDERING:
+                        message = """عذراً، لم أفهم تماماً ما تريد طلبه. 
 
 يمكنك قول:
 • "بدي برجر كلاسيكي"
@@ -210,8 +424,8 @@ class ConversationOrchestrator:
 • "أطلب وجبة دجاج"
 
 ما الذي تريد طلبه؟"""
-                elif partial_intent == IntentType.INQUIRY:
-                    message = """عذراً، لم أفهم استفسارك بوضوح.
+                    case IntentType.INQUIRY:
+                        message = """عذراً، لم أفهم استفسارك بوضوح.
 
 يمكنك السؤال عن:
 • المنيو والأطباق المتوفرة
@@ -220,8 +434,8 @@ class ConversationOrchestrator:
 • معلومات التوصيل
 
 ماذا تريد أن تعرف؟"""
-                elif partial_intent == IntentType.TRACKING:
-                    message = """عذراً، لم أفهم ما تريد تتبعه.
+                    case IntentType.TRACKING:
+                        message = """عذراً، لم أفهم ما تريد تتبعه.
 
 للاستفسار عن طلبك:
 • "وين طلبي؟"
@@ -229,8 +443,8 @@ class ConversationOrchestrator:
 • "حالة الطلب رقم 12345"
 
 ما هو رقم طلبك أو ماذا تريد أن تعرف؟"""
-                else:
-                    message = """عذراً، لم أفهم طلبك بوضوح. 
+                    case _:
+                        message = """عذراً، لم أفهم طلبك بوضوح. 
 
 هل يمكنك إعادة صياغته بطريقة أخرى؟
 
@@ -239,7 +453,7 @@ class ConversationOrchestrator:
 • ما هي الوجبات المتاحة؟ (للاستفسار)
 • أين طلبي؟ (للتتبع)"""
             
-            elif session.unclear_count == 2:
+            elif unclear_count == 2:
                 # Second attempt - be more specific
                 message = """آسف، ما زلت غير متأكد مما تريد. 
 
@@ -258,9 +472,10 @@ class ConversationOrchestrator:
 قل "موظف" أو "تحويل لموظف" وسأحولك فوراً."""
         
         else:  # English
-            if session.unclear_count == 1:
-                if partial_intent == IntentType.ORDERING:
-                    message = """Sorry, I didn't fully understand what you want to order.
+            if unclear_count == 1:
+                match partial_intent:
+                    case IntentType.ORDERING:
+                        message = """Sorry, I didn't fully understand what you want to order.
 
 You can say:
 • "I want a classic burger"
@@ -268,8 +483,8 @@ You can say:
 • "Get me a chicken meal"
 
 What would you like to order?"""
-                elif partial_intent == IntentType.INQUIRY:
-                    message = """Sorry, I didn't understand your question clearly.
+                    case IntentType.INQUIRY:
+                        message = """Sorry, I didn't understand your question clearly.
 
 You can ask about:
 • Menu and available dishes
@@ -278,8 +493,8 @@ You can ask about:
 • Delivery information
 
 What would you like to know?"""
-                elif partial_intent == IntentType.TRACKING:
-                    message = """Sorry, I didn't understand what you want to track.
+                    case IntentType.TRACKING:
+                        message = """Sorry, I didn't understand what you want to track.
 
 To check your order:
 • "Where is my order?"
@@ -287,8 +502,8 @@ To check your order:
 • "How long until my order is ready?"
 
 What's your order number or what do you want to know?"""
-                else:
-                    message = """Sorry, I didn't understand your request clearly.
+                    case _:
+                        message = """Sorry, I didn't understand your request clearly.
 
 Could you rephrase it?
 
@@ -297,7 +512,7 @@ For example:
 • "What's on the menu?" (to inquire)
 • "Where is my order?" (to track)"""
             
-            elif session.unclear_count == 2:
+            elif unclear_count == 2:
                 message = """I'm still not sure what you need.
 
 Please be more specific:
@@ -313,7 +528,7 @@ What exactly do you need?"""
 Would you like to speak with a customer service representative?
 Say "agent" or "transfer to human" and I'll connect you."""
         
-        return ConversationResponse(
+        return ConversationResponse.model_construct(
             response=message,
             session_id=session.id,
             conversation_state=session.conversation_state,
@@ -328,30 +543,11 @@ Say "agent" or "transfer to human" and I'll connect you."""
             conversation_history = self.context_manager.get_conversation_history(session, limit=1)
             if not conversation_history or len(conversation_history) == 0:
                 # First interaction - show welcome message
-                if language == "ar":
-                    welcome_text = """مرحباً! أهلاً بك في خدمة برجريزر للطلبات.
-
-أنا هنا لمساعدتك في:
-- تقديم طلب طعام
-- الاستفسار عن المنيو
-- تتبع طلبك
-- الإبلاغ عن مشكلة
-
-كيف يمكنني مساعدتك اليوم؟"""
-                else:
-                    welcome_text = """Welcome to Burgerizzer ordering service.
-
-I'm here to help you with:
-- Placing food orders
-- Menu inquiries
-- Tracking your order
-- Reporting issues
-
-How can I help you today?"""
+                welcome_text = _WELCOME_TEXTS[_LANG_IDX.get(language, 1)]
                 
                 self.context_manager.add_message_to_history(session, "assistant", welcome_text)
                 self.context_manager.update_conversation_state(session, ConversationState.GREETING)
-                return ConversationResponse(
+                return ConversationResponse.model_construct(
                     response=welcome_text,
                     session_id=session.id,
                     conversation_state=session.conversation_state,
@@ -359,419 +555,303 @@ How can I help you today?"""
                     intent=IntentType.GREETING
                 )
             
-            if intent_result.intent == IntentType.GREETING:
-                self.context_manager.update_conversation_state(session, ConversationState.GREETING)
-                if language == "ar":
-                    response_text = """مرحباً!  أهلاً بك في خدمة الطلبات.
-
-كيف يمكنني مساعدتك اليوم؟
-
- تقديم طلب طعام
- الاستفسار عن المنيو
- تتبع طلبك
- الإبلاغ عن مشكلة
-
-قل لي ماذا تحتاج!"""
-                else:
-                    response_text = """Hello!  Welcome to our ordering service.
-
-How can I help you today?
-
- Place a food order
- Inquire about menu
- Track your order
- Report an issue
-
-Let me know what you need!"""
-                
-                self.context_manager.add_message_to_history(session, "assistant", response_text)
-                return ConversationResponse(
-                    response=response_text,
-                    session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=intent_result.confidence,
-                    intent=intent_result.intent
-                )
+            # Dispatch to the handler for this intent (O(1) lookup instead of an if/elif chain)
+            handler = self._intent_handlers.get(intent_result.intent, self._handle_default)
+            return handler(intent_result, message, session, language)
+        except Exception as e:
+            logger.error("Critical error in _route_to_agent: %s", e, exc_info=True)
+            # Fallback response on critical error (prebuilt; only the session id varies)
+            return _ROUTE_FALLBACKS[_LANG_IDX.get(language, 1)].model_copy(
+                update={"session_id": session.id}
+            )
+    
+    def _handle_greeting(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Greet the customer and list what the assistant can do"""
+        response_text = _localized_template(IntentType.GREETING, language)
+        
+        self.context_manager.commit(
+            session, state=ConversationState.GREETING, message=("assistant", response_text)
+        )
+        return _make_template_response(session, intent_result, language)
+    
+    def _handle_inquiry(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Answer menu questions via the menu agent"""
+        try:
+            self.context_manager.update_conversation_state(session, ConversationState.BROWSING_MENU)
+            response_text = self.menu_agent.handle_inquiry(message)
+            self.context_manager.add_message_to_history(session, "assistant", response_text)
+            return _make_response(session, intent_result, response_text)
+        except Exception as e:
+            logger.error("Menu agent failed: %s", e)
+            fallback = "عذراً، حدث خطأ عند البحث في المنيو. هل يمكنك المحاولة مرة أخرى؟" if language == "ar" else "Sorry, error searching menu. Can you try again?"
+            self.context_manager.add_message_to_history(session, "assistant", fallback)
+            return ConversationResponse.model_construct(
+                response=fallback,
+                session_id=session.id,
+                conversation_state=session.conversation_state,
+                confidence=0.5,
+                intent=intent_result.intent
+            )
+    
+    def _handle_ordering(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Add items to the order draft via the order agent"""
+        try:
+            self.context_manager.update_conversation_state(session, ConversationState.BUILDING_ORDER)
+            with self._agent_savepoint():
+                result = self.order_agent.process_order_request(message, session, intent_result.entities)
             
-            elif intent_result.intent == IntentType.INQUIRY:
-                try:
-                    self.context_manager.update_conversation_state(session, ConversationState.BROWSING_MENU)
-                    response_text = self.menu_agent.handle_inquiry(message)
-                    self.context_manager.add_message_to_history(session, "assistant", response_text)
-                    return ConversationResponse(
-                        response=response_text,
-                        session_id=session.id,
-                        conversation_state=session.conversation_state,
-                        confidence=intent_result.confidence,
-                        intent=intent_result.intent
-                    )
-                except Exception as e:
-                    logger.error(f"Menu agent failed: {e}")
-                    fallback = "عذراً، حدث خطأ عند البحث في المنيو. هل يمكنك المحاولة مرة أخرى؟" if language == "ar" else "Sorry, error searching menu. Can you try again?"
-                    self.context_manager.add_message_to_history(session, "assistant", fallback)
-                    return ConversationResponse(
-                        response=fallback,
-                        session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=0.5,
-                    intent=intent_result.intent
-                )
+            if result["success"] and result.get("order_draft"):
+                self.context_manager.update_order_draft(session, result["order_draft"])
             
-            elif intent_result.intent == IntentType.ORDERING:
-                try:
-                    self.context_manager.update_conversation_state(session, ConversationState.BUILDING_ORDER)
-                    result = self.order_agent.process_order_request(message, session, intent_result.entities)
-                    
-                    if result["success"] and result.get("order_draft"):
-                        self.context_manager.update_order_draft(session, result["order_draft"])
-                    
-                    # IMPORTANT: Always include current order draft, even on errors
-                    # This ensures the receipt persists through unclear requests or not-found items
-                    current_draft = None
-                    if session.current_order_draft:
-                        try:
-                            current_draft = json.loads(session.current_order_draft)
-                        except:
-                            pass
-                    
-                    # Build response with order_draft (use current draft if result doesn't have one)
-                    response = ConversationResponse(
-                        response=result["message"],
-                        session_id=session.id,
-                        conversation_state=session.conversation_state,
-                        confidence=intent_result.confidence,
-                        intent=intent_result.intent,
-                        order_draft=result.get("order_draft") or current_draft  # Always include current draft
-                    )
-                    
-                    self.context_manager.add_message_to_history(session, "assistant", response.response)
-                    return response
-                except Exception as e:
-                    logger.error(f"Order processing failed: {e}")
-                    # Rollback any partial changes
-                    self.db.rollback()
-                    fallback = "عذراً، حدث خطأ عند معالجة طلبك. هل يمكنك إعادة المحاولة؟" if language == "ar" else "Sorry, error processing your order. Can you try again?"
-                    self.context_manager.add_message_to_history(session, "assistant", fallback)
-                    return ConversationResponse(
-                        response=fallback,
-                        session_id=session.id,
-                        conversation_state=session.conversation_state,
-                        confidence=0.5,
-                        intent=intent_result.intent
-                    )
+            # IMPORTANT: Always include current order draft, even on errors
+            # This ensures the receipt persists through unclear requests or not-found items
+            current_draft = self.context_manager.get_order_draft(session)
             
-            elif intent_result.intent == IntentType.COMPLAINT:
-                try:
-                    self.context_manager.update_conversation_state(session, ConversationState.RESOLVING_ISSUE)
-                    result = self.issue_agent.handle_complaint(
-                        message,
-                        session.customer_id,
-                        intent_result.entities
-                    )
-                    response_text = result["message"]
-                    self.context_manager.add_message_to_history(session, "assistant", response_text)
-                    return ConversationResponse(
-                        response=response_text,
-                        session_id=session.id,
-                        conversation_state=session.conversation_state,
-                        confidence=intent_result.confidence,
-                        intent=intent_result.intent
-                    )
-                except Exception as e:
-                    logger.error(f"Issue resolution failed: {e}")
-                    # Rollback any partial changes
-                    self.db.rollback()
-                    fallback = "عذراً، حدث خطأ. دعني أحولك إلى موظف لمساعدتك..." if language == "ar" else "Sorry, error occurred. Let me transfer you to an agent..."
-                    self.context_manager.add_message_to_history(session, "assistant", fallback)
-                    # Auto-escalate on error
-                    self.audit_logger.log(
-                        action="auto_escalated_on_error",
-                        customer_id=session.customer_id,
-                        details={"error": str(e)}
-                    )
-                    return ConversationResponse(
-                        response=fallback,
-                        session_id=session.id,
-                        conversation_state=ConversationState.ENDED,
-                        confidence=0.5,
-                        intent=IntentType.ESCALATE
-                    )
+            # Build response with order_draft (use current draft if result doesn't have one)
+            response = _make_response(
+                session,
+                intent_result,
+                result["message"],
+                order_draft=result.get("order_draft") or current_draft  # Always include current draft
+            )
             
-            elif intent_result.intent == IntentType.TRACKING:
-                # Get order_id from entities or use latest order
-                order_id = intent_result.entities.get("order_id")
-                
-                from src.models.database import Order
-                order = None
-                
-                if order_id:
-                    order = self.db.query(Order).filter(Order.id.like(f"{order_id}%")).first()
-                else:
-                    # Get most recent order for this customer
-                    order = self.db.query(Order).filter(
-                        Order.customer_id == session.customer_id
-                    ).order_by(Order.created_at.desc()).first()
-                
-                if not order:
-                    response_text = "لم أتمكن من إيجاد طلبك. هل يمكنك تزويدي برقم الطلب؟"
-                else:
-                    status_ar = {
-                        "PENDING": "قيد التحضير",
-                        "READY": "جاهز للاستلام",
-                        "DELIVERED": "تم التسليم",
-                        "CANCELLED": "ملغي"
-                    }
-                    status_text = status_ar.get(order.status.value, order.status.value)
-                    
-                    from datetime import datetime
-                    if order.status.value == "PENDING" and order.estimated_ready_time:
-                        time_diff = (order.estimated_ready_time - datetime.utcnow()).total_seconds()
-                        if time_diff > 0:
-                            minutes = int(time_diff / 60)
-                            response_text = f"طلبك رقم #{str(order.order_number)[:8]}\n\nحالة: {status_text}\nسيكون جاهز خلال {minutes} دقيقة"
-                        else:
-                            response_text = f"طلبك رقم #{str(order.order_number)[:8]}\n\nحالة: {status_text}\nطلبك جاهز للاستلام"
-                    else:
-                        response_text = f"طلبك رقم #{str(order.order_number)[:8]}\n\nحالة: {status_text}"
-                
-                self.context_manager.add_message_to_history(session, "assistant", response_text)
-                return ConversationResponse(
-                    response=response_text,
-                    session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=intent_result.confidence,
-                    intent=intent_result.intent
+            self.context_manager.add_message_to_history(session, "assistant", response.response)
+            return response
+        except Exception as e:
+            logger.error("Order processing failed: %s", e)
+            # Partial agent changes were already rolled back to the savepoint
+            fallback = "عذراً، حدث خطأ عند معالجة طلبك. هل يمكنك إعادة المحاولة؟" if language == "ar" else "Sorry, error processing your order. Can you try again?"
+            self.context_manager.add_message_to_history(session, "assistant", fallback)
+            return ConversationResponse.model_construct(
+                response=fallback,
+                session_id=session.id,
+                conversation_state=session.conversation_state,
+                confidence=0.5,
+                intent=intent_result.intent
+            )
+    
+    def _handle_complaint(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Handle a complaint via the issue resolution agent"""
+        try:
+            self.context_manager.update_conversation_state(session, ConversationState.RESOLVING_ISSUE)
+            with self._agent_savepoint():
+                result = self.issue_agent.handle_complaint(
+                    message,
+                    session.customer_id,
+                    intent_result.entities
                 )
+            response_text = result["message"]
+            self.context_manager.add_message_to_history(session, "assistant", response_text)
+            return _make_response(session, intent_result, response_text)
+        except Exception as e:
+            logger.error("Issue resolution failed: %s", e)
+            # Partial agent changes were already rolled back to the savepoint
+            fallback = "عذراً، حدث خطأ. دعني أحولك إلى موظف لمساعدتك..." if language == "ar" else "Sorry, error occurred. Let me transfer you to an agent..."
+            self.context_manager.add_message_to_history(session, "assistant", fallback)
+            # Auto-escalate on error
+            self.audit_logger.enqueue(
+                action="auto_escalated_on_error",
+                customer_id=session.customer_id,
+                details={"error": str(e)}
+            )
+            return ConversationResponse.model_construct(
+                response=fallback,
+                session_id=session.id,
+                conversation_state=ConversationState.ENDED,
+                confidence=0.5,
+                intent=IntentType.ESCALATE
+            )
+    
+    def _handle_tracking(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Report the status of the customer's latest order"""
+        # Get order_id from entities or use latest order
+        order_id = intent_result.entities.get("order_id")
+        
+        from src.models.database import Order
+        order = None
+        
+        if order_id:
+            order = self.db.query(Order).filter(Order.id.like(f"{order_id}%")).first()
+        else:
+            # Get most recent order for this customer
+            order = self.db.query(Order).filter(
+                Order.customer_id == session.customer_id
+            ).order_by(Order.created_at.desc()).first()
+        
+        if not order:
+            response_text = "لم أتمكن من إيجاد طلبك. هل يمكنك تزويدي برقم الطلب؟"
+        else:
+            status_ar = {
+                "PENDING": "قيد التحضير",
+                "READY": "جاهز للاستلام",
+                "DELIVERED": "تم التسليم",
+                "CANCELLED": "ملغي"
+            }
+            status_text = status_ar.get(order.status.value, order.status.value)
             
-            elif intent_result.intent == IntentType.REMOVE:
-                # Remove item from current order
-                result = self.order_agent.remove_item(message, session, intent_result.entities)
-                
-                # Check if this should retry as an ordering intent (compound message)
-                if not result["success"] and result.get("should_retry_as_order"):
-                    logger.info("Retrying compound message as ordering intent")
-                    # Retry as ordering intent
-                    try:
-                        self.context_manager.update_conversation_state(session, ConversationState.BUILDING_ORDER)
-                        order_result = self.order_agent.process_order_request(message, session, intent_result.entities)
-                        
-                        if order_result["success"] and order_result.get("order_draft"):
-                            self.context_manager.update_order_draft(session, order_result["order_draft"])
-                        
-                        # Get current draft for fallback
-                        current_draft = None
-                        if session.current_order_draft:
-                            try:
-                                current_draft = json.loads(session.current_order_draft)
-                            except:
-                                pass
-                        
-                        response = ConversationResponse(
-                            response=order_result["message"],
-                            session_id=session.id,
-                            conversation_state=session.conversation_state,
-                            confidence=intent_result.confidence,
-                            intent=IntentType.ORDERING,  # Change intent to ORDERING
-                            order_draft=order_result.get("order_draft") or current_draft
-                        )
-                        
-                        self.context_manager.add_message_to_history(session, "assistant", response.response)
-                        return response
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to retry as ordering: {e}")
-                        # Fall back to original remove result
+            from datetime import datetime
+            if order.status.value == "PENDING" and order.estimated_ready_time:
+                time_diff = (order.estimated_ready_time - datetime.utcnow()).total_seconds()
+                if time_diff > 0:
+                    minutes = int(time_diff / 60)
+                    response_text = f"طلبك رقم #{str(order.order_number)[:8]}\n\nحالة: {status_text}\nسيكون جاهز خلال {minutes} دقيقة"
+                else:
+                    response_text = f"طلبك رقم #{str(order.order_number)[:8]}\n\nحالة: {status_text}\nطلبك جاهز للاستلام"
+            else:
+                response_text = f"طلبك رقم #{str(order.order_number)[:8]}\n\nحالة: {status_text}"
+        
+        self.context_manager.add_message_to_history(session, "assistant", response_text)
+        return _make_response(session, intent_result, response_text)
+    
+    def _handle_remove(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Remove items from the order draft"""
+        # Remove item from current order
+        with self._agent_savepoint():
+            result = self.order_agent.remove_item(message, session, intent_result.entities)
+        
+        # Check if this should retry as an ordering intent (compound message)
+        if not result["success"] and result.get("should_retry_as_order"):
+            logger.info("Retrying compound message as ordering intent")
+            # Retry as ordering intent
+            try:
+                self.context_manager.update_conversation_state(session, ConversationState.BUILDING_ORDER)
+                with self._agent_savepoint():
+                    order_result = self.order_agent.process_order_request(message, session, intent_result.entities)
                 
-                if result["success"] and result.get("order_draft"):
-                    self.context_manager.update_order_draft(session, result["order_draft"])
+                if order_result["success"] and order_result.get("order_draft"):
+                    self.context_manager.update_order_draft(session, order_result["order_draft"])
                 
-                # Get current draft for fallback on errors
-                current_draft = None
-                if session.current_order_draft:
-                    try:
-                        current_draft = json.loads(session.current_order_draft)
-                    except:
-                        pass
+                # Get current draft for fallback
+                current_draft = self.context_manager.get_order_draft(session)
                 
-                response = ConversationResponse(
-                    response=result["message"],
+                response = ConversationResponse.model_construct(
+                    response=order_result["message"],
                     session_id=session.id,
                     conversation_state=session.conversation_state,
                     confidence=intent_result.confidence,
-                    intent=intent_result.intent,
-                    order_draft=result.get("order_draft") or current_draft  # Always include current draft
+                    intent=IntentType.ORDERING,  # Change intent to ORDERING
+                    order_draft=order_result.get("order_draft") or current_draft
                 )
                 
                 self.context_manager.add_message_to_history(session, "assistant", response.response)
                 return response
-            
-            elif intent_result.intent == IntentType.QUERY_ORDER:
-                # Answer questions about order
-                result = self.order_agent.query_order(message, session, intent_result.entities)
-                response_text = result["message"]
-                
-                self.context_manager.add_message_to_history(session, "assistant", response_text)
-                return ConversationResponse(
-                    response=response_text,
-                    session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=intent_result.confidence,
-                    intent=intent_result.intent
-                )
-            
-            elif intent_result.intent == IntentType.CONFIRM_ORDER:
-                # Submit current order
-                if not session.current_order_draft:
-                    response_text = "❌ لا يوجد طلب لتأكيده.\n\n📋 أضف بعض المنتجات أولاً"
-                    self.context_manager.add_message_to_history(session, "assistant", response_text)
-                    return ConversationResponse(
-                        response=response_text,
-                        session_id=session.id,
-                        conversation_state=session.conversation_state,
-                        confidence=intent_result.confidence,
-                        intent=intent_result.intent
-                    )
                 
-                # Submit order and clear draft
-                try:
-                    result = self.order_agent.submit_order(session)
-                    response_text = result["message"]
-                    
-                    if result["success"]:
-                        # Update conversation state to greeting for new session
-                        self.context_manager.update_conversation_state(session, ConversationState.GREETING)
-                        
-                        self.context_manager.add_message_to_history(session, "assistant", response_text)
-                        return ConversationResponse(
-                            response=response_text,
-                            session_id=session.id,
-                            conversation_state=session.conversation_state,
-                            confidence=intent_result.confidence,
-                            intent=intent_result.intent,
-                            order_draft=None,  # Clear the order draft
-                            order_cleared=True,  # Indicate order was cleared
-                            order_number=result.get("order_number"),  # Pass order number to frontend
-                            receipt_data=result.get("receipt_data")  # Pass receipt data for table display
-                        )
-                    else:
-                        self.context_manager.add_message_to_history(session, "assistant", response_text)
-                        return ConversationResponse(
-                            response=response_text,
-                            session_id=session.id,
-                            conversation_state=session.conversation_state,
-                            confidence=intent_result.confidence,
-                            intent=intent_result.intent,
-                            order_draft=json.loads(session.current_order_draft) if session.current_order_draft else None
-                        )
-                    
-                except Exception as e:
-                    logger.error(f"Order submission failed: {e}")
-                    response_text = "❌ عذراً، حدث خطأ عند تأكيد الطلب.\n\n🔄 يرجى المحاولة مرة أخرى"
-                    self.context_manager.add_message_to_history(session, "assistant", response_text)
-                    return ConversationResponse(
-                        response=response_text,
-                        session_id=session.id,
-                        conversation_state=session.conversation_state,
-                        confidence=0.5,
-                        intent=IntentType.UNCLEAR
-                    )
+            except Exception as e:
+                logger.error("Failed to retry as ordering: %s", e)
+                # Partial agent changes were already rolled back to the savepoint;
+                # fall back to original remove result
+        
+        if result["success"] and result.get("order_draft"):
+            self.context_manager.update_order_draft(session, result["order_draft"])
+        
+        # Get current draft for fallback on errors
+        current_draft = self.context_manager.get_order_draft(session)
+        
+        response = _make_response(
+            session,
+            intent_result,
+            result["message"],
+            order_draft=result.get("order_draft") or current_draft  # Always include current draft
+        )
+        
+        self.context_manager.add_message_to_history(session, "assistant", response.response)
+        return response
+    
+    def _handle_query_order(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Answer questions about the current order draft"""
+        # Answer questions about order
+        result = self.order_agent.query_order(message, session, intent_result.entities)
+        response_text = result["message"]
+        
+        self.context_manager.add_message_to_history(session, "assistant", response_text)
+        return _make_response(session, intent_result, response_text)
+    
+    def _handle_confirm_order(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Submit the current order draft"""
+        # Submit current order
+        if not session.current_order_draft:
+            response_text = "❌ لا يوجد طلب لتأكيده.\n\n📋 أضف بعض المنتجات أولاً"
+            self.context_manager.add_message_to_history(session, "assistant", response_text)
+            return _make_response(session, intent_result, response_text)
+        
+        # Submit order and clear draft
+        try:
+            result = self.order_agent.submit_order(session)
+            response_text = result["message"]
             
-            elif intent_result.intent == IntentType.CANCEL:
-                # Clear the current order draft
-                self.context_manager.clear_order_draft(session)
+            if result["success"]:
+                # Update conversation state to greeting for new session
                 self.context_manager.update_conversation_state(session, ConversationState.GREETING)
-                if language == "ar":
-                    response_text = """✅ تم إلغاء الطلب السابق وبدء طلب جديد.
-
-📋 ماذا تريد أن تطلب اليوم؟"""
-                else:
-                    response_text = """✅ Previous order cancelled. New order started.
-
-📋 What would you like to order today?"""                
-                
-                self.context_manager.add_message_to_history(session, "assistant", response_text)
-                return ConversationResponse(
-                    response=response_text,
-                    session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=intent_result.confidence,
-                    intent=intent_result.intent,
-                    order_draft={"items": [], "subtotal": 0, "tax": 0, "delivery_fee": 0, "total": 0}
-                )
-            
-            elif intent_result.intent == IntentType.ESCALATE:
-                # Escalate to human agent
-                self.context_manager.update_conversation_state(session, ConversationState.ENDED)
-                if language == "ar":
-                    response_text = """جاري تحويلك إلى موظف خدمة العملاء...
-
-سيتواصل معك أحد ممثلينا قريباً لمساعدتك.
-
-شكراً لصبرك."""
-                else:
-                    response_text = """Transferring you to a customer service representative...
-
-Thank you for your patience."""
-                
-                self.audit_logger.log(
-                    action="escalated_to_human",
-                    customer_id=session.customer_id,
-                    details={"reason": message, "session_id": str(session.id)}
-                )
                 
                 self.context_manager.add_message_to_history(session, "assistant", response_text)
-                return ConversationResponse(
-                    response=response_text,
-                    session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=intent_result.confidence,
-                    intent=intent_result.intent
+                return _make_response(
+                    session,
+                    intent_result,
+                    response_text,
+                    order_draft=None,  # Clear the order draft
+                    order_cleared=True,  # Indicate order was cleared
+                    order_number=result.get("order_number"),  # Pass order number to frontend
+                    receipt_data=result.get("receipt_data")  # Pass receipt data for table display
                 )
-            
-            elif intent_result.intent == IntentType.FAREWELL:
-                self.context_manager.update_conversation_state(session, ConversationState.ENDED)
-                if language == "ar":
-                    response_text = """شكراً لك! 
-
-أتمنى لك يوماً سعيداً. 
-إذا احتجت أي شيء، أنا هنا دائماً لمساعدتك!
-
-مع السلامة"""
-                else:
-                    response_text = """Thank you!
-
-Have a great day!
-If you need anything else, I'm always here to help.
-
-Goodbye!"""
-                
-                self.context_manager.add_message_to_history(session, "assistant", response_text)
-                return ConversationResponse(
-                    response=response_text,
-                    session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=intent_result.confidence,
-                    intent=intent_result.intent
-                )
-            
             else:
-                response_text = "أنا هنا لمساعدتك! يمكنك السؤال عن المنيو تقديم طلب، أو الإبلاغ عن مشكلة."
                 self.context_manager.add_message_to_history(session, "assistant", response_text)
-                return ConversationResponse(
-                    response=response_text,
-                    session_id=session.id,
-                    conversation_state=session.conversation_state,
-                    confidence=intent_result.confidence,
-                    intent=intent_result.intent
+                return _make_response(
+                    session,
+                    intent_result,
+                    response_text,
+                    order_draft=self.context_manager.get_order_draft(session)
                 )
+            
         except Exception as e:
-            logger.error(f"Critical error in _route_to_agent: {e}", exc_info=True)
-            # Fallback response on critical error
-            fallback = "عذراً، حدث خطأ. دعني أحولك لموظف..." if language == "ar" else "Sorry, error occurred. Let me transfer you..."
-            return ConversationResponse(
-                response=fallback,
+            logger.error("Order submission failed: %s", e)
+            response_text = "❌ عذراً، حدث خطأ عند تأكيد الطلب.\n\n🔄 يرجى المحاولة مرة أخرى"
+            self.context_manager.add_message_to_history(session, "assistant", response_text)
+            return ConversationResponse.model_construct(
+                response=response_text,
                 session_id=session.id,
-                conversation_state=ConversationState.ENDED,
-                confidence=0.0,
-                intent=IntentType.ESCALATE
+                conversation_state=session.conversation_state,
+                confidence=0.5,
+                intent=IntentType.UNCLEAR
             )
+    
+    def _handle_cancel(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Discard the current order draft and start over"""
+        # Clear the current order draft (single commit for all context writes)
+        response_text = _localized_template(IntentType.CANCEL, language)
+        self.context_manager.commit(
+            session,
+            state=ConversationState.GREETING,
+            message=("assistant", response_text),
+            clear_draft=True
+        )
+        return _make_template_response(session, intent_result, language)
+    
+    def _handle_escalate(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Hand the conversation over to a human agent"""
+        # Escalate to human agent
+        response_text = _localized_template(IntentType.ESCALATE, language)
+        self.audit_logger.enqueue(
+            action="escalated_to_human",
+            customer_id=session.customer_id,
+            details={"reason": message, "session_id": str(session.id)}
+        )
+        # The audit row rides on the context commit below
+        self.audit_logger.flush(commit=False)
+        self.context_manager.commit(
+            session, state=ConversationState.ENDED, message=("assistant", response_text)
+        )
+        return _make_template_response(session, intent_result, language)
+    
+    def _handle_farewell(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """End the conversation"""
+        response_text = _localized_template(IntentType.FAREWELL, language)
+        self.context_manager.commit(
+            session, state=ConversationState.ENDED, message=("assistant", response_text)
+        )
+        return _make_template_response(session, intent_result, language)
+    
+    def _handle_default(self, intent_result: IntentResult, message: str, session, language: str) -> ConversationResponse:
+        """Fallback for intents without a dedicated handler"""
+        response_text = _UNCLEAR_DEFAULT
+        self.context_manager.add_message_to_history(session, "assistant", response_text)
+        return _make_response(session, intent_result, response_text)
@@ -1,20 +1,419 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import or_, func
-from src.models.database import Order, OrderItem, MenuItem, Session as SessionModel
+from src.models.database import Order, OrderItem, MenuItem, Session as SessionModel, generate_uuid
 from src.models.enums import OrderStatus
 from src.services.recommendations import RecommendationEngine
 from src.services.audit_logger import AuditLogger
-from typing import Dict, List
-import json
+from src.services.context_manager import load_order_draft, store_order_draft
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Optional
+import heapq
+from bisect import bisect_left, bisect_right
 import logging
-import random
+import re
+import secrets
+import threading
+import time
+import unicodedata
 from datetime import datetime, timedelta
 from langchain_openai import ChatOpenAI
 from src.config import settings
+from src.utils import json_codec
+from src.utils.arabic import keyword_pattern, normalize_arabic
 
 logger = logging.getLogger(__name__)
 
+
+# Intent keywords matched as substrings of the lowercased message
+_REMOVE_KEYWORDS_RE = keyword_pattern("احذف", "حذف", "شيل", "ازالة", "remove", "delete")
+_ADD_KEYWORDS_RE = keyword_pattern("أضف", "اضف", "أريد", "بدي", "عايز", "add", "want")
+
+# Order query topics, checked in this order by _format_order_query_response
+_PRICE_QUERY_RE = keyword_pattern("كم", "how much", "total", "سعر", "مبلغ", "price")
+_COUNT_QUERY_RE = keyword_pattern("how many", "عدد", "كم عدد")
+_CONTENTS_QUERY_RE = keyword_pattern("what", "ماذا", "ما هو", "شو")
+
+# Order references in query_order: #12345678, 12345678, order 12345678
+_ORDER_NUMBER_RE = re.compile(r'#?([0-9]{8})')
+# Arabic-Indic and Extended Arabic-Indic digits -> ASCII, for the pattern above
+_AR_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+# Customer-facing status labels for query_order. Keyed by the enum itself: the
+# stored values are lowercase, so the old uppercase string keys never matched.
+_ORDER_STATUS_TEXT = MappingProxyType({
+    OrderStatus.PENDING: "🔄 قيد التحضير",
+    OrderStatus.CONFIRMED: "✅ تم التأكيد",
+    OrderStatus.PREPARING: "👨‍🍳 يتم التحضير",
+    OrderStatus.OUT_FOR_DELIVERY: "🚚 في الطريق إليك",
+    OrderStatus.DELIVERED: "✅ تم التسليم",
+    OrderStatus.CANCELLED: "❌ ملغي"
+})
+
+# Trailing commas before a closing bracket/brace, a common LLM JSON mistake
+_TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+
+# Compound add/remove messages, one pattern per keyword in priority order:
+# 'واضف بطاطس' / 'add fries' and 'احذف المشروب' / 'احذف 1 مشروب غازي'
+_ADD_PART_PATTERNS = tuple(
+    re.compile(rf'{keyword}\s+(.+?)$', re.IGNORECASE)
+    for keyword in ('واضف', 'أضف', 'اضف', 'أريد', 'and add', 'add')
+)
+_TRAILING_SEPARATORS_RE = re.compile(r'[,،وو]+$')
+_REMOVE_ITEM_PATTERNS = tuple(
+    re.compile(rf'{keyword}\s+(?:\d+\s+)?([\u0600-\u06FF\w\s]+?)(?:،|و|واضف|add|want|$)', re.IGNORECASE)
+    for keyword in ('احذف', 'حذف', 'شيل', 'remove', 'delete')
+)
+
+def _iter_json_objects(text: str):
+    """Yield each top-level {...} span in text, left to right
+    
+    A single linear scan tracking brace depth and string-literal state, so
+    braces inside JSON strings are ignored and there is no regex backtracking
+    on long LLM replies.
+    """
+    depth = 0
+    start = 0
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = depth > 0
+        elif ch == '{':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+
+
+# Compound-message parsing is a pure function of the text; utterances repeat
+# (retries, identical orders), so results are memoized.
+@lru_cache(maxsize=1024)
+def _add_only_part(message: str) -> str:
+    """The part of a message after its add keyword, or the whole message"""
+    # Find the add part of the message (after واضف or add keywords)
+    for pattern in _ADD_PART_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            add_part = match.group(1).strip()
+            # Clean up common separators
+            return _TRAILING_SEPARATORS_RE.sub('', add_part)
+    
+    # Fallback: return the original message
+    return message
+
+
+@lru_cache(maxsize=1024)
+def _items_to_remove(message: str) -> tuple:
+    """Item phrases following remove keywords, in keyword order"""
+    items = []
+    for pattern in _REMOVE_ITEM_PATTERNS:
+        for match in pattern.findall(message):
+            # Clean up the match and add to removal list
+            cleaned = match.strip().rstrip('،و')
+            if cleaned:
+                items.append(cleaned)
+    return tuple(items)
+
+
+# Static part of the item-extraction prompt. The customer message goes last so every
+# call shares an identical prefix (eligible for provider-side prompt caching) and the
+# template is not re-formatted per request.
+_ITEM_EXTRACTION_PROMPT = '''Extract food items with quantities and attributes from the customer message at the end.
+
+IMPORTANT RULES:
+1. Resolve contextual references ("the burger", "it", etc.) by combining with attributes mentioned later
+2. If an attribute is mentioned ("classic", "large", "spicy"), attach it to the relevant item
+3. Combine item name with its attributes into a single descriptive name
+4. Arabic numbers: واحد=1, اثنين=2, ثلاثة=3, أربعة=4, خمسة=5, etc.
+
+Examples:
+- "1 burger and 2 fries, the burger is classic" → [{"name":"classic burger","quantity":1},{"name":"fries","quantity":2}]
+- "أريد برجر وبطاطس، البرجر كلاسيكي" → [{"name":"برجر كلاسيكي","quantity":1},{"name":"بطاطس","quantity":1}]
+- "2 pizzas, one pepperoni and one veggie" → [{"name":"pepperoni pizza","quantity":1},{"name":"veggie pizza","quantity":1}]
+- "محتاج اتنين برجر واحد بطاطس، البرجر خالي كلاسيكي" → [{"name":"برجر كلاسيكي","quantity":2},{"name":"بطاطس","quantity":1}]
+
+Return JSON array ONLY: [{"name":"item with attributes","quantity":number}]
+Return [] if no items found.'''
+
+# Shared tail of the single and batched LLM menu-matching prompts
+_LLM_MATCH_CONFIDENCE_GUIDE = """Confidence guide:
+- 1.0: Perfect exact match
+- 0.9: Very likely (minor spelling variation)
+- 0.7: Probable (phonetic similarity, common typo)
+- 0.5: Possible but uncertain
+- 0.3: Weak match
+- 0.0: No match"""
+_LLM_MATCH_CACHE_SIZE = 512  # per menu snapshot
+
+# Totals are computed in integer halalas (1/100 SAR) so they are exact
+_TAX_PERCENT = 15  # 15% KSA tax rate
+_DELIVERY_FEE_HALALAS = 0  # No delivery fee for drive-thru pickup
+
+# Strategy 4 keyword rules, specific -> general: (query keywords, predicate on
+# the item's lowered English name and category). The first rule whose keywords
+# appear in the query and that has a matching menu item wins.
+_KEYWORD_RULES = (
+    # Burgers - specific types first
+    (('كلاسيكي', 'classic'), lambda name, category: 'classic' in name and 'burger' in name),
+    (('جبنة', 'جبن', 'cheese'), lambda name, category: 'cheese' in name and 'burger' in name),
+    (('دجاج', 'chicken'), lambda name, category: 'chicken' in name),
+    (('نباتي', 'veggie'), lambda name, category: 'veggie' in name),
+    (('بيكون', 'bacon'), lambda name, category: 'bacon' in name),
+    # Generic burger (after specific types)
+    (('برجر', 'برغر', 'burger'), lambda name, category: 'burger' in name),
+    
+    # Pizza types
+    (('ببروني', 'بيبروني', 'pepperoni'), lambda name, category: 'pepperoni' in name),
+    (('مارجريتا', 'margherita'), lambda name, category: 'margherita' in name),
+    (('بيتزا', 'pizza'), lambda name, category: 'pizza' in name),
+    
+    # Sides
+    (('بطاطس', 'بطاطا', 'فرايز', 'فرويز', 'fries'), lambda name, category: 'fries' in name),
+    (('حلقات', 'بصل', 'onion rings'), lambda name, category: 'onion' in name),
+    
+    # Beverages
+    (('كولا', 'كوكا', 'cola', 'coca'), lambda name, category: 'cola' in name),
+    (('مشروب', 'صودا', 'سودا', 'soda'), lambda name, category: 'soda' in name or category == 'Beverages'),
+)
+_KEYWORD_RULE_PATTERNS = tuple(keyword_pattern(*keywords) for keywords, _ in _KEYWORD_RULES)
+
+
+# _find_similar_items hints: Arabic food word (pre-normalized) -> menu category
+_CATEGORY_HINTS = tuple((normalize_arabic(hint), category) for hint, category in (
+    ('فرويز', 'Sides'),
+    ('فرايز', 'Sides'),
+    ('بطاطس', 'Sides'),
+    ('بطاطا', 'Sides'),
+    ('سودا', 'Beverages'),
+    ('صودا', 'Beverages'),
+    ('مشروب', 'Beverages'),
+    ('عصير', 'Beverages'),
+    ('برجر', 'Burgers'),
+    ('برغر', 'Burgers'),
+    ('بيتزا', 'Pizza'),
+    ('دجاج', 'Chicken'),
+    ('وينجز', 'Sides'),
+    ('أجنحة', 'Sides'),
+    ('سلطة', 'Sides'),
+))
+
+
+class _MenuEntry(NamedTuple):
+    """Read-only copy of an available MenuItem's matching fields
+    
+    Exposes the same attribute names as MenuItem, so matchers and callers can
+    use either interchangeably.
+    """
+    id: str
+    name: str
+    arabic_name: Optional[str]
+    category: str
+    price: float
+
+
+class _SubstringIndex(NamedTuple):
+    """Substring lookups over an index-aligned column of names, one C-level pass each
+    
+    Both lookups return the lowest matching index, i.e. the same entry a
+    front-to-back scan of the column would stop at.
+    """
+    blob: str  # the names joined with NUL, so a query cannot match across two names
+    starts: tuple  # offset of each joined name in blob
+    indexes: tuple  # column index of each joined name (None entries are skipped)
+    contained: Optional[re.Pattern]  # overlapping lookahead over the distinct names, in index order
+    first_index: Dict[str, int]  # name -> lowest column index carrying it
+
+    @classmethod
+    def build(cls, names: tuple) -> "_SubstringIndex":
+        present = [(idx, name) for idx, name in enumerate(names) if name is not None]
+        starts, offset = [], 0
+        for _, name in present:
+            starts.append(offset)
+            offset += len(name) + 1
+        first_index = {}
+        for idx, name in present:
+            first_index.setdefault(name, idx)
+        # At each position the alternation takes the first listed alternative
+        # that matches, so listing names by index yields the lowest index there
+        contained = re.compile(
+            "(?=(" + "|".join(map(re.escape, first_index)) + "))"
+        ) if first_index else None
+        return cls(
+            blob="\0".join(name for _, name in present),
+            starts=tuple(starts),
+            indexes=tuple(idx for idx, _ in present),
+            contained=contained,
+            first_index=first_index
+        )
+
+    def first_containing(self, query: str) -> Optional[int]:
+        """Lowest index whose name contains query"""
+        if not self.indexes or "\0" in query:
+            return None
+        pos = self.blob.find(query)
+        if pos < 0:
+            return None
+        return self.indexes[bisect_right(self.starts, pos) - 1]
+
+    def first_contained_in(self, query: str) -> Optional[int]:
+        """Lowest index whose name occurs in query"""
+        if self.contained is None:
+            return None
+        best = None
+        for match in self.contained.finditer(query):
+            idx = self.first_index[match.group(1)]
+            if best is None or idx < best:
+                best = idx
+                if idx == 0:
+                    break
+        return best
+
+
+class _MenuIndex(NamedTuple):
+    """Available menu entries plus index-aligned, pre-normalized name columns
+    
+    Matching loops scan these flat string tuples instead of re-lowering and
+    re-normalizing every item's names on every call.
+    """
+    entries: tuple
+    by_id: Dict[str, _MenuEntry]
+    names_lower: tuple
+    arabic_lower: tuple  # None where an item has no Arabic name
+    arabic_norm: tuple  # normalize_arabic(arabic_name), None where missing
+    name_words: tuple  # frozenset of names_lower's words
+    arabic_norm_words: tuple  # frozenset of arabic_norm's words, None where missing
+    arabic_prefixes: tuple  # sorted (arabic_norm word, entry index) pairs for prefix lookups
+    name_substrings: _SubstringIndex  # over names_lower
+    arabic_substrings: _SubstringIndex  # over arabic_lower
+    exact: Dict[str, _MenuEntry]  # lowered/normalized name -> first entry with it
+    keyword_rules: tuple  # (compiled keywords, first matching entry) per _KEYWORD_RULES rule
+    category_names: Dict[str, tuple]  # category -> display names of its first 3 items
+    menu_json: str  # compact menu listing for LLM matching prompts (ids are entry indexes)
+    llm_matches: Dict[str, tuple]  # match key -> (entry or None, confidence) from the LLM
+
+    @classmethod
+    def build(cls, entries: tuple) -> "_MenuIndex":
+        names_lower = tuple(entry.name.lower() for entry in entries)
+        arabic_lower = tuple(entry.arabic_name.lower() if entry.arabic_name else None for entry in entries)
+        arabic_norm = tuple(normalize_arabic(entry.arabic_name) if entry.arabic_name else None for entry in entries)
+        
+        # setdefault keeps the earliest item per key, matching a front-to-back scan
+        exact = {}
+        for entry, name, arabic in zip(entries, names_lower, arabic_lower):
+            exact.setdefault(name, entry)
+            if arabic:
+                exact.setdefault(arabic, entry)
+        for entry, normalized in zip(entries, arabic_norm):
+            if normalized:
+                exact.setdefault(normalized, entry)
+        
+        # Rule predicates only look at the item, so resolve each rule's item once
+        keyword_rules = []
+        for pattern, (_, predicate) in zip(_KEYWORD_RULE_PATTERNS, _KEYWORD_RULES):
+            target = next(
+                (entry for entry, name in zip(entries, names_lower) if predicate(name, entry.category)),
+                None
+            )
+            if target is not None:
+                keyword_rules.append((pattern, target))
+        
+        category_names = {}
+        for entry in entries:
+            names = category_names.setdefault(entry.category, [])
+            if len(names) < 3:
+                names.append(entry.arabic_name or entry.name)
+        
+        return cls(
+            entries=entries,
+            by_id={entry.id: entry for entry in entries},
+            names_lower=names_lower,
+            arabic_lower=arabic_lower,
+            arabic_norm=arabic_norm,
+            name_words=tuple(frozenset(name.split()) for name in names_lower),
+            arabic_norm_words=tuple(frozenset(norm.split()) if norm is not None else None for norm in arabic_norm),
+            arabic_prefixes=tuple(sorted(
+                (word, idx)
+                for idx, norm in enumerate(arabic_norm) if norm is not None
+                for word in set(norm.split())
+            )),
+            name_substrings=_SubstringIndex.build(names_lower),
+            arabic_substrings=_SubstringIndex.build(arabic_lower),
+            exact=exact,
+            keyword_rules=tuple(keyword_rules),
+            category_names={category: tuple(names) for category, names in category_names.items()},
+            menu_json=json_codec.dumps([
+                {"id": idx, "name": entry.name, "arabic_name": entry.arabic_name, "category": entry.category}
+                for idx, entry in enumerate(entries)
+            ]),
+            # Lives exactly as long as this snapshot, so it never outlives a menu change
+            llm_matches={}
+        )
+
+    def prefix_candidates(self, words) -> set:
+        """Indexes of entries with an Arabic word starting with any of words"""
+        prefixes = self.arabic_prefixes
+        found = set()
+        for word in words:
+            pos = bisect_left(prefixes, (word,))
+            while pos < len(prefixes) and prefixes[pos][0].startswith(word):
+                found.add(prefixes[pos][1])
+                pos += 1
+        return found
+
+
+# Available menu shared by agent instances, as plain tuples so it outlives the
+# request's DB session. Tagged with the engine it was read from; the index is
+# swapped in as one object so concurrent readers never see mismatched columns.
+_menu_snapshot = {
+    "menu": None,
+    "bind": None,
+    "timestamp": 0,
+    "ttl": 60
+}
+
+# Resolved item names -> (menu_item_id, confidence). Top sellers repeat across
+# sessions, so a hit skips the full-menu scan and the LLM matching round trip.
+# Only matches are cached; misses fall through to the full search each time.
+_menu_match_cache = {
+    "entries": OrderedDict(),
+    "timestamp": 0,
+    "ttl": 300,  # 5 minutes, same as the menu agent's item cache
+    "max_size": 512
+}
+# Agents run in the request threadpool; the LRU's read-then-reorder/delete
+# steps must not interleave with another thread's clear or eviction
+_menu_match_lock = threading.Lock()
+
+
+def _menu_match_key(item_name: str) -> str:
+    """Normalize an item name for the match cache"""
+    return unicodedata.normalize("NFKC", item_name).strip().lower()
+
+
+def clear_menu_match_cache() -> None:
+    """Drop cached item-name matches and the menu snapshot they are resolved
+    against (call after editing the menu)"""
+    with _menu_match_lock:
+        _menu_match_cache["entries"].clear()
+        _menu_match_cache["timestamp"] = time.time()
+    # Matches re-hydrate from the snapshot, so a stale one would keep serving
+    # items that were just made unavailable
+    _menu_snapshot["menu"] = None
+
+
 # Singleton LLM instance for order processing agent
 _order_llm_instance = None
 
@@ -46,14 +445,17 @@ class OrderProcessingAgent:
     - Provide order queries and summaries
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cheap_match_threshold: float = 0.92):
         """Initialize order processing agent
         
         Args:
             db: SQLAlchemy database session
+            cheap_match_threshold: Confidence at which an exact/substring/keyword
+                menu match is accepted without asking the LLM
         """
         try:
             self.db = db
+            self.cheap_match_threshold = cheap_match_threshold
             self.recommendation_engine = RecommendationEngine()
             self.audit_logger = AuditLogger(db)
             
@@ -72,8 +474,8 @@ class OrderProcessingAgent:
             
             # Check if this is a compound message (contains both remove and add)
             message_lower = message.lower()
-            has_remove_keywords = any(word in message_lower for word in ["احذف", "حذف", "شيل", "ازالة", "remove", "delete"])
-            has_add_keywords = any(word in message_lower for word in ["أضف", "اضف", "أريد", "بدي", "عايز", "add", "want"])
+            has_remove_keywords = _REMOVE_KEYWORDS_RE.search(message_lower) is not None
+            has_add_keywords = _ADD_KEYWORDS_RE.search(message_lower) is not None
             
             compound_result = None
             
@@ -85,7 +487,9 @@ class OrderProcessingAgent:
                         # Extract items to remove using keywords
                         remove_items = self._extract_items_to_remove(message)
                         if remove_items:
-                            remove_result = self.remove_item(message, session, {"items": remove_items})
+                            remove_result = self.remove_item(
+                                message, session, {"items": remove_items}, message_lower=message_lower
+                            )
                             if remove_result["success"]:
                                 compound_result = f"{remove_result['message']}\n\n📝 والآن أضيف المنتجات الجديدة:\n"
                     except Exception as e:
@@ -126,81 +530,117 @@ class OrderProcessingAgent:
             logger.error("Order processing failed: %s", e, exc_info=True)
             return {"success": False, "message": "عذراً، حدث خطأ عند معالجة طلبك. جاري تحويلك الي احد موظفينا."}
 
+    def _stream_json_array(self, prompt: str) -> str:
+        """Stream the LLM reply and stop as soon as it forms a complete JSON array
+        
+        The model is configured with streaming=True; any trailing text after the
+        array (explanations, code fences) is never waited for.
+        
+        Returns:
+            Stripped reply text (the complete array when one was detected)
+        """
+        from langchain.schema import HumanMessage
+        
+        parts = []
+        for chunk in self.llm.stream([HumanMessage(content=prompt)]):
+            parts.append(chunk.content)
+            if "]" not in chunk.content:
+                continue
+            content = "".join(parts).strip()
+            if content.startswith("[") and content.endswith("]"):
+                try:
+                    json_codec.loads(content)
+                except ValueError:
+                    continue  # "]" closed a nested list, keep reading
+                break  # Complete array; closing the generator ends the request
+        return "".join(parts).strip()
+    
     def _extract_items_with_llm(self, message: str) -> List[Dict]:
         """Extract items from message using intelligent LLM extraction
         Handles contextual references and attributes like 'the burger is classic'
         Returns list of dicts with 'name' and 'quantity' keys
         """
         try:
-            from langchain.schema import HumanMessage
-            
             # Enhanced prompt to handle contextual references and attributes
-            prompt = f'''Extract food items with quantities and attributes from: "{message}"
-
-IMPORTANT RULES:
-1. Resolve contextual references ("the burger", "it", etc.) by combining with attributes mentioned later
-2. If an attribute is mentioned ("classic", "large", "spicy"), attach it to the relevant item
-3. Combine item name with its attributes into a single descriptive name
-4. Arabic numbers: واحد=1, اثنين=2, ثلاثة=3, أربعة=4, خمسة=5, etc.
+            prompt = f'{_ITEM_EXTRACTION_PROMPT}\n\nCustomer message: "{message}"'
 
-Examples:
-- "1 burger and 2 fries, the burger is classic" → [{{"name":"classic burger","quantity":1}},{{"name":"fries","quantity":2}}]
-- "أريد برجر وبطاطس، البرجر كلاسيكي" → [{{"name":"برجر كلاسيكي","quantity":1}},{{"name":"بطاطس","quantity":1}}]
-- "2 pizzas, one pepperoni and one veggie" → [{{"name":"pepperoni pizza","quantity":1}},{{"name":"veggie pizza","quantity":1}}]
-- "محتاج اتنين برجر واحد بطاطس، البرجر خالي كلاسيكي" → [{{"name":"برجر كلاسيكي","quantity":2}},{{"name":"بطاطس","quantity":1}}]
-
-Return JSON array ONLY: [{{"name":"item with attributes","quantity":number}}]
-Return [] if no items found.'''
-
-            response = self.llm.invoke([HumanMessage(content=prompt)])
-            content = response.content.strip()
+            content = self._stream_json_array(prompt)
             
             # Parse JSON response
             if content.startswith('[') and content.endswith(']'):
-                try:
-                    items = json.loads(content)
+                items = self._parse_item_array(content)
+                if isinstance(items, list):
                     # Validate and clean items
                     validated = []
                     for item in items:
-                        if isinstance(item, dict) and "name" in item:
-                            name = item["name"].strip()
+                        if isinstance(item, dict):
+                            name = str(item.get("name", "")).strip()
                             quantity = max(1, int(item.get("quantity", 1)))
                             if name:  # Only add if name is not empty
                                 validated.append({"name": name, "quantity": quantity})
                         elif isinstance(item, str) and item.strip():
                             validated.append({"name": item.strip(), "quantity": 1})
                     return validated
-                except (json.JSONDecodeError, ValueError) as e:
-                    logger.warning(f"JSON parsing failed: {e}, trying ast")
-                    try:
-                        import ast
-                        items = ast.literal_eval(content)
-                        if isinstance(items, list):
-                            validated = []
-                            for item in items:
-                                if isinstance(item, dict):
-                                    name = str(item.get("name", "")).strip()
-                                    quantity = max(1, int(item.get("quantity", 1)))
-                                    if name:
-                                        validated.append({"name": name, "quantity": quantity})
-                                elif isinstance(item, str) and item.strip():
-                                    validated.append({"name": item.strip(), "quantity": 1})
-                            return validated
-                    except Exception:
-                        pass
             
             return []
         except Exception as e:
             logger.error(f"LLM extraction error: {e}")
             return []
     
+    def _parse_item_array(self, content: str):
+        """Parse the extraction reply, repairing common LLM JSON slips
+        
+        Tries strict JSON, then JSON with trailing commas removed (and single
+        quotes swapped when no double quotes are present), and only then the
+        much slower ast.literal_eval.
+        
+        Returns:
+            Parsed object, or None if nothing could parse it
+        """
+        try:
+            return json_codec.loads(content)
+        except ValueError as e:  # includes JSONDecodeError
+            logger.warning(f"JSON parsing failed: {e}, trying repair")
+        
+        cleaned = _TRAILING_COMMA_RE.sub(r"\1", content)
+        if '"' not in cleaned:
+            cleaned = cleaned.replace("'", '"')
+        try:
+            return json_codec.loads(cleaned)
+        except ValueError:
+            pass
+        
+        try:
+            import ast
+            return ast.literal_eval(content)
+        except Exception:
+            return None
+    
+    def _load_draft(self, session: SessionModel) -> Optional[Dict]:
+        """Editable copy of the session's order draft
+        
+        The JSON is parsed once per stored version (see load_order_draft); only the
+        draft dict and its flat item dicts are copied, so edits never leak into the cache.
+        """
+        draft = load_order_draft(session)
+        if draft is None:
+            return None
+        return {**draft, "items": [dict(item) for item in draft.get("items", [])]}
+    
     def _process_items_directly(self, items: List, entities: Dict, session: SessionModel) -> Dict:
         """Enhanced processing with confidence checking and better item handling"""
         try:
             # Load order draft
-            order_draft = json.loads(session.current_order_draft) if session.current_order_draft else {"items": []}
+            order_draft = self._load_draft(session) or {"items": []}
             if order_draft.get("items"):
                 order_draft["items"] = self._aggregate_items(order_draft["items"])
+            by_id = {itm["id"]: itm for itm in order_draft["items"]}
+            
+            # Several new names in one message: resolve them in one LLM round trip
+            self._prefetch_llm_matches([
+                item if isinstance(item, str) else item.get("name", item.get("item", ""))
+                for item in items if isinstance(item, (str, dict))
+            ], self._menu_index())
             
             found_items = []
             not_found = []
@@ -225,21 +665,20 @@ Return [] if no items found.'''
                 # Confidence-based decision flow
                 if menu_item and confidence >= 0.85:  # High confidence: add directly
                     quantity_to_add = self._parse_quantity(item_quantity)
-                    existing_item = next(
-                        (itm for itm in order_draft["items"] if itm["id"] == str(menu_item.id)),
-                        None
-                    )
+                    existing_item = by_id.get(str(menu_item.id))
                     if existing_item:
                         existing_item["quantity"] += quantity_to_add
                     else:
-                        order_draft["items"].append({
+                        new_item = {
                             "id": str(menu_item.id),
                             "name": menu_item.name,
                             "arabic_name": menu_item.arabic_name or menu_item.name,
                             "price": menu_item.price,
                             "category": menu_item.category,
                             "quantity": quantity_to_add
-                        })
+                        }
+                        order_draft["items"].append(new_item)
+                        by_id[new_item["id"]] = new_item
                     found_items.append(f"{quantity_to_add} {menu_item.arabic_name or menu_item.name}")
                     
                 elif menu_item and 0.6 <= confidence < 0.85:  # Medium confidence: ask for confirmation
@@ -265,7 +704,7 @@ Return [] if no items found.'''
             order_draft.update(totals)
             
             # Save updated draft
-            session.current_order_draft = json.dumps(order_draft)
+            store_order_draft(session, order_draft)
             self.db.commit()
             
             # Build response message
@@ -307,7 +746,7 @@ Return [] if no items found.'''
             }
         
         try:
-            draft = json.loads(session.current_order_draft)
+            draft = self._load_draft(session)
             
             # Validate draft has items
             if not draft.get("items"):
@@ -316,13 +755,35 @@ Return [] if no items found.'''
                     "message": "الطلب فارغ. أضف منتجات أولاً."
                 }
             
+            # Validate all menu items still exist and are available (one IN query)
+            item_ids = {item_data["id"] for item_data in draft["items"]}
+            available_ids = {
+                row.id for row in self.db.query(MenuItem.id).filter(
+                    MenuItem.id.in_(item_ids),
+                    MenuItem.is_available == True
+                )
+            }
+            for item_data in draft["items"]:
+                if item_data["id"] not in available_ids:
+                    logger.warning(f"Menu item {item_data['id']} no longer available")
+                    return {
+                        "success": False,
+                        "message": f"عذراً، {item_data.get('arabic_name', item_data['name'])} لم يعد متاحاً. يرجى تحديث طلبك."
+                    }
+            
             # Begin transaction
-            # Generate readable order number
-            date_str = datetime.now().strftime("%Y%m%d")
-            random_suffix = random.randint(1000, 9999)
-            order_number = f"BRG-{date_str}-{random_suffix}"
+            # One clock read (UTC, like created_at) for the order number and ready time
+            now = datetime.utcnow()
+            order_number = self._generate_readable_order_number(now)
+            
+            # Store readable order number in draft for receipt display
+            draft["order_number"] = order_number
             
-            order = Order(
+            # Core INSERTs: the order and its items are write-only here, so skip the
+            # ORM unit of work; the id is generated up front instead of flushed for
+            order_id = generate_uuid()
+            self.db.execute(Order.__table__.insert().values(
+                id=order_id,
                 customer_id=session.customer_id,
                 status=OrderStatus.PENDING,
                 subtotal=draft["subtotal"],
@@ -330,42 +791,21 @@ Return [] if no items found.'''
                 delivery_fee=draft.get("delivery_fee", 0),
                 total=draft["total"],
                 fulfillment_type="drive-thru",
-                order_number=order_number
-            )
-            self.db.add(order)
-            self.db.flush()  # Get order ID before adding items
-            
-            # Store readable order number in draft for receipt display
-            draft["order_number"] = order_number
-            
-            # Schedule order to be ready in 1 minute
-            order.estimated_ready_time = datetime.utcnow() + timedelta(minutes=1)
-            order.status = OrderStatus.PENDING
-            
-            # Add order items
-            for item_data in draft["items"]:
-                # Validate menu item still exists and is available
-                menu_item = self.db.query(MenuItem).filter(
-                    MenuItem.id == item_data["id"],
-                    MenuItem.is_available == True
-                ).first()
-                
-                if not menu_item:
-                    logger.warning(f"Menu item {item_data['id']} no longer available")
-                    # Rollback and return error
-                    self.db.rollback()
-                    return {
-                        "success": False,
-                        "message": f"عذراً، {item_data.get('arabic_name', item_data['name'])} لم يعد متاحاً. يرجى تحديث طلبك."
-                    }
-                
-                order_item = OrderItem(
-                    order_id=order.id,
-                    menu_item_id=item_data["id"],
-                    quantity=item_data["quantity"],
-                    unit_price=item_data["price"]
-                )
-                self.db.add(order_item)
+                order_number=order_number,
+                # Schedule order to be ready in 1 minute
+                estimated_ready_time=now + timedelta(minutes=1)
+            ))
+            
+            # Add order items (one executemany)
+            self.db.execute(OrderItem.__table__.insert(), [
+                {
+                    "order_id": order_id,
+                    "menu_item_id": item_data["id"],
+                    "quantity": item_data["quantity"],
+                    "unit_price": item_data["price"]
+                }
+                for item_data in draft["items"]
+            ])
             
             # Commit transaction
             self.db.commit()
@@ -380,7 +820,7 @@ Return [] if no items found.'''
                     action="order_created",
                     customer_id=session.customer_id,
                     session_id=session.id,
-                    details={"order_id": str(order.id), "total": draft["total"], "items_count": len(draft["items"])}
+                    details={"order_id": order_id, "total": draft["total"], "items_count": len(draft["items"])}
                 )
             except Exception as e:
                 logger.warning(f"Audit logging failed: {e}")
@@ -409,7 +849,7 @@ Return [] if no items found.'''
             return {
                 "success": True,
                 "message": confirmation_msg,
-                "order_id": str(order.id),
+                "order_id": order_id,
                 "order_number": order_number,  # Readable format (e.g., BRG-20260127-1234)
                 "order_cleared": True,  # Indicate order was cleared
                 "receipt_data": receipt_data  # Include full receipt for display
@@ -430,12 +870,14 @@ Return [] if no items found.'''
                 "message": "عذراً، حدث خطأ غير متوقع. يرجى المحاولة مرة أخرى."
             }
     
-    def _generate_readable_order_number(self) -> str:
+    def _generate_readable_order_number(self, now: Optional[datetime] = None) -> str:
         """Generate a readable order number in format: BRG-YYYYMMDD-XXXX
         Example: BRG-20260127-1234
         """
-        date_str = datetime.now().strftime("%Y%m%d")
-        random_suffix = random.randint(1000, 9999)
+        date_str = (now or datetime.utcnow()).strftime("%Y%m%d")
+        # secrets draws from os.urandom, so concurrent submits don't contend on
+        # the shared random module generator
+        random_suffix = 1000 + secrets.randbelow(9000)
         return f"BRG-{date_str}-{random_suffix}"
     
     def _parse_quantity(self, quantity_input) -> int:
@@ -464,11 +906,16 @@ Return [] if no items found.'''
             logger.warning(f"Failed to parse quantity '{quantity_input}': {e}")
             return 1
     
-    def remove_item(self, message: str, session: SessionModel, entities: Dict) -> Dict:
-        """Remove item(s) from current order"""
+    def remove_item(self, message: str, session: SessionModel, entities: Dict, message_lower: Optional[str] = None) -> Dict:
+        """Remove item(s) from current order
+        
+        Args:
+            message_lower: Lowercased message if the caller already computed it
+        """
         # Check if this is a compound message (remove + add)
-        message_lower = message.lower()
-        has_add_keywords = any(word in message_lower for word in ["أضف", "اضف", "أريد", "بدي", "عايز", "add", "want"])
+        if message_lower is None:
+            message_lower = message.lower()
+        has_add_keywords = _ADD_KEYWORDS_RE.search(message_lower) is not None
         
         if not session.current_order_draft:
             if has_add_keywords:
@@ -484,7 +931,8 @@ Return [] if no items found.'''
                     "message": "❌ لا يوجد طلب حالي لحذف منه.\n\n📋 أضف بعض المنتجات أولاً لبدء طلب جديد!"
                 }
         
-        order_draft = json.loads(session.current_order_draft)
+        order_draft = self._load_draft(session)
+        by_id = {itm["id"]: itm for itm in order_draft["items"]}
         items = entities.get("items", [])
         
         if not items:
@@ -511,15 +959,13 @@ Return [] if no items found.'''
             menu_item, confidence = self._find_menu_item(item_name)
             if menu_item:
                 # Find item in current order
-                existing_item = next(
-                    (item for item in order_draft["items"] if item["id"] == str(menu_item.id)),
-                    None
-                )
+                existing_item = by_id.get(str(menu_item.id))
                 
                 if existing_item:
                     if existing_item["quantity"] <= quantity_to_remove:
-                        # Remove item completely
-                        order_draft["items"].remove(existing_item)
+                        # Remove item completely (dropped from the list below)
+                        existing_item["quantity"] = 0
+                        del by_id[existing_item["id"]]
                         removed_items.append(f"{menu_item.arabic_name or menu_item.name} (كل الكمية)")
                     else:
                         # Reduce quantity
@@ -536,6 +982,8 @@ Return [] if no items found.'''
                 "message": f"لم أجد '{', '.join(not_found)}' في طلبك الحالي."
             }
         
+        order_draft["items"] = [itm for itm in order_draft["items"] if itm["quantity"] > 0]
+        
         # Recalculate totals
         if order_draft["items"]:
             totals = self._calculate_totals(order_draft["items"])
@@ -561,10 +1009,7 @@ Return [] if no items found.'''
         
         # Also try to extract order number from message
         if not order_id:
-            import re
-            # Look for patterns like #12345678, 12345678, order 12345678
-            order_pattern = r'#?([0-9]{8})'
-            match = re.search(order_pattern, message)
+            match = _ORDER_NUMBER_RE.search(message.translate(_AR_DIGITS))
             if match:
                 order_id = match.group(1)
         
@@ -580,18 +1025,19 @@ Return [] if no items found.'''
                     "message": f"❌ لم أجد طلب برقم {order_id}\n\n🔍 تأكد من رقم الطلب وحاول مرة أخرى"
                 }
             
-            # Load order items
-            order_items = self.db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-            items_info = []
-            for oi in order_items:
-                menu_item = self.db.query(MenuItem).filter(MenuItem.id == oi.menu_item_id).first()
-                if menu_item:
-                    items_info.append({
-                        "name": menu_item.name,
-                        "arabic_name": menu_item.arabic_name,
-                        "quantity": oi.quantity,
-                        "price": oi.unit_price
-                    })
+            # Load order items together with their menu items (single JOIN query)
+            rows = self.db.query(OrderItem, MenuItem).join(
+                MenuItem, MenuItem.id == OrderItem.menu_item_id
+            ).filter(OrderItem.order_id == order.id).all()
+            items_info = [
+                {
+                    "name": menu_item.name,
+                    "arabic_name": menu_item.arabic_name,
+                    "quantity": oi.quantity,
+                    "price": oi.unit_price
+                }
+                for oi, menu_item in rows
+            ]
             
             # Format completed order response
             items_summary = "\n".join([
@@ -599,14 +1045,7 @@ Return [] if no items found.'''
                 for item in items_info
             ])
             
-            status_text = {
-                "PENDING": "🔄 قيد التحضير",
-                "CONFIRMED": "✅ تم التأكيد", 
-                "PREPARING": "👨‍🍳 يتم التحضير",
-                "OUT_FOR_DELIVERY": "🚚 في الطريق إليك",
-                "DELIVERED": "✅ تم التسليم",
-                "CANCELLED": "❌ ملغي"
-            }.get(order.status.value, order.status.value)
+            status_text = _ORDER_STATUS_TEXT.get(order.status, order.status.value)
             
             response = f"""📋 طلب رقم: #{order.order_number or 'N/A'}
 📊 الحالة: {status_text}
@@ -629,29 +1068,24 @@ Return [] if no items found.'''
                 "message": "لا يوجد طلب حالي."
             }
         
-        order_draft = json.loads(session.current_order_draft)
-        return self._format_order_query_response(message, order_draft["items"], order_draft["total"], order_draft["subtotal"])
+        order_draft = load_order_draft(session)
+        return self._format_order_query_response(message.lower(), order_draft["items"], order_draft["total"], order_draft["subtotal"])
     
-    def _format_order_query_response(self, message: str, items: List[Dict], total: float, subtotal: float, is_completed: bool = False) -> Dict:
-        """Format response for order queries"""
-        message_lower = message.lower()
+    def _format_order_query_response(self, message_lower: str, items: List[Dict], total: float, subtotal: float, is_completed: bool = False) -> Dict:
+        """Format response for order queries
         
+        Args:
+            message_lower: Customer message, already lowercased by the caller
+        """
         # Check what the user is asking about
-        if any(word in message_lower for word in ["كم", "how much", "total", "سعر", "مبلغ", "price"]):
+        if _PRICE_QUERY_RE.search(message_lower):
             # Asking about price/total
-            response = f"المبلغ الإجمالي {'للطلب' if is_completed else 'الحالي'}: {total:.2f} SAR\n"
-            response += f"المجموع الفرعي: {subtotal:.2f} SAR"
-        elif any(word in message_lower for word in ["how many", "عدد", "كم عدد"]):
+            response = (
+                f"المبلغ الإجمالي {'للطلب' if is_completed else 'الحالي'}: {total:.2f} SAR\n"
+                f"المجموع الفرعي: {subtotal:.2f} SAR"
+            )
+        elif _COUNT_QUERY_RE.search(message_lower):
             # Asking about quantity
-            # Check if asking about specific item
-            item_counts = {}
-            for item in items:
-                name = item.get("arabic_name") or item.get("name")
-                if name in item_counts:
-                    item_counts[name] += item["quantity"]
-                else:
-                    item_counts[name] = item["quantity"]
-            
             # Check if asking about specific item type
             if "برجر" in message_lower or "burger" in message_lower:
                 burger_count = sum(
@@ -661,176 +1095,173 @@ Return [] if no items found.'''
                 )
                 response = f"عدد البرجر {'في الطلب' if is_completed else 'الحالي'}: {burger_count}"
             else:
-                total_items = sum(item["quantity"] for item in items)
-                response = f"عدد المنتجات {'في الطلب' if is_completed else 'الحالي'}: {total_items}\n\n"
-                for name, count in item_counts.items():
-                    response += f"• {name}: {count}\n"
-        elif any(word in message_lower for word in ["what", "ماذا", "ما هو", "شو"]):
+                item_counts = {}
+                for item in items:
+                    name = item.get("arabic_name") or item.get("name")
+                    item_counts[name] = item_counts.get(name, 0) + item["quantity"]
+                
+                total_items = sum(item_counts.values())
+                lines = "".join(f"• {name}: {count}\n" for name, count in item_counts.items())
+                response = f"عدد المنتجات {'في الطلب' if is_completed else 'الحالي'}: {total_items}\n\n{lines}"
+        elif _CONTENTS_QUERY_RE.search(message_lower):
             # Asking what's in the order
-            response = f"{'الطلب يحتوي' if is_completed else 'طلبك الحالي يحتوي'} على:\n\n"
-            for item in items:
-                name = item.get("arabic_name") or item.get("name")
-                response += f"• {item['quantity']}x {name} ({item['price']:.2f} SAR)\n"
-            response += f"\nالإجمالي: {total:.2f} SAR"
+            lines = "".join(
+                f"• {item['quantity']}x {item.get('arabic_name') or item.get('name')} ({item['price']:.2f} SAR)\n"
+                for item in items
+            )
+            response = f"{'الطلب يحتوي' if is_completed else 'طلبك الحالي يحتوي'} على:\n\n{lines}\nالإجمالي: {total:.2f} SAR"
         else:
             # Generic order summary
             total_items = sum(item["quantity"] for item in items)
-            response = f"{'الطلب' if is_completed else 'طلبك الحالي'}:\n"
-            response += f"• عدد المنتجات: {total_items}\n"
-            response += f"• الإجمالي: {total:.2f} SAR"
+            response = (
+                f"{'الطلب' if is_completed else 'طلبك الحالي'}:\n"
+                f"• عدد المنتجات: {total_items}\n"
+                f"• الإجمالي: {total:.2f} SAR"
+            )
         
         return {
             "success": True,
             "message": response
         }
     
+    def _menu_index(self) -> _MenuIndex:
+        """Available menu index, re-read from the database at most once per TTL"""
+        current_time = time.time()
+        bind = self.db.get_bind()
+        if _menu_snapshot["menu"] is not None and _menu_snapshot["bind"] is bind \
+                and (current_time - _menu_snapshot["timestamp"]) < _menu_snapshot["ttl"]:
+            return _menu_snapshot["menu"]
+        
+        rows = self.db.query(
+            MenuItem.id, MenuItem.name, MenuItem.arabic_name, MenuItem.category, MenuItem.price
+        ).filter(MenuItem.is_available == True).all()
+        menu = _MenuIndex.build(tuple(_MenuEntry(*row) for row in rows))
+        _menu_snapshot["menu"] = menu
+        _menu_snapshot["bind"] = bind
+        _menu_snapshot["timestamp"] = current_time
+        return menu
+    
     def _find_menu_item(self, item_name: str) -> tuple:
         """Optimized menu item matching with multi-strategy approach
         
         Returns:
-            tuple: (MenuItem, confidence_score) or (None, 0.0)
+            tuple: (menu entry, confidence_score) or (None, 0.0); the entry
+            carries MenuItem's id, name, arabic_name, category and price
         """
         if not item_name or not isinstance(item_name, str):
             return None, 0.0
         
-        item_lower = item_name.lower().strip()
+        menu = self._menu_index()
+        if not menu.entries:
+            return None, 0.0
         
-        # Get all available menu items (cached would be better in production)
-        all_items = self.db.query(MenuItem).filter(
-            MenuItem.is_available == True
-        ).all()
+        key = _menu_match_key(item_name)
+        entries = _menu_match_cache["entries"]
+        if time.time() - _menu_match_cache["timestamp"] >= _menu_match_cache["ttl"]:
+            clear_menu_match_cache()
         
-        if not all_items:
-            return None, 0.0
+        with _menu_match_lock:
+            cached = entries.get(key)
+            if cached is not None:
+                # Re-hydrate from the snapshot; gone means no longer available
+                menu_item = menu.by_id.get(cached[0])
+                if menu_item is not None:
+                    entries.move_to_end(key)
+                    return menu_item, cached[1]
+                del entries[key]
         
-        # Strategy 1: Exact match (highest confidence)
-        for menu_item in all_items:
-            if menu_item.name.lower() == item_lower or \
-               (menu_item.arabic_name and menu_item.arabic_name.lower() == item_lower):
-                return menu_item, 1.0
+        # Matching may call the LLM, so it runs outside the lock
+        menu_item, confidence = self._match_menu_item(item_name, menu)
+        if menu_item is not None:
+            with _menu_match_lock:
+                entries[key] = (menu_item.id, confidence)
+                if len(entries) > _menu_match_cache["max_size"]:
+                    entries.popitem(last=False)
+        return menu_item, confidence
+    
+    def _match_menu_item(self, item_name: str, menu: _MenuIndex) -> tuple:
+        """Run the matching strategies against the available menu
         
-        # Strategy 2: LLM-based intelligent matching (best for complex queries)
+        The local strategies run first; the LLM is only consulted when they do
+        not reach cheap_match_threshold.
+        """
+        item_lower = item_name.lower().strip()
+        # The query is normalized once here and reused by the later strategies
+        normalized_query = normalize_arabic(item_lower)
+        
+        cheap_item, cheap_confidence = self._cheap_match(item_lower, normalized_query, menu)
+        if cheap_item is not None and cheap_confidence >= self.cheap_match_threshold:
+            return cheap_item, cheap_confidence
+        
+        # LLM-based intelligent matching (best for complex queries)
         try:
-            matched_item, confidence = self._llm_based_menu_matching(item_name, all_items)
+            matched_item, confidence = self._llm_based_menu_matching(item_name, menu)
             if matched_item and confidence >= 0.85:
                 logger.info(f"LLM matched '{item_name}' → '{matched_item.name}' (conf: {confidence:.2f})")
                 return matched_item, confidence
         except Exception as e:
             logger.warning(f"LLM matching failed: {e}")
         
-        # Strategy 3: Direct substring matching (fast and reliable)
-        matches = []
-        for menu_item in all_items:
-            # English name contains search term
-            if item_lower in menu_item.name.lower():
-                matches.append((menu_item, 0.95))
-                continue
-            # Search term contains item name
-            if menu_item.name.lower() in item_lower:
-                matches.append((menu_item, 0.93))
-                continue
-            # Arabic name matching
-            if menu_item.arabic_name:
-                arabic_lower = menu_item.arabic_name.lower()
-                if item_lower in arabic_lower or arabic_lower in item_lower:
-                    matches.append((menu_item, 0.92))
-        
-        if matches:
-            # Return best match
-            best = max(matches, key=lambda x: x[1])
-            return best[0], best[1]
-        
-        # Strategy 4: Enhanced keyword mapping (specific → general)
-        keyword_map = self._get_keyword_mappings()
-        
-        for keywords, category_filter in keyword_map:
-            if any(kw in item_lower for kw in keywords):
-                # Try to find matching item
-                for menu_item in all_items:
-                    if category_filter(menu_item, item_lower):
-                        return menu_item, 0.88
-        
-        # Strategy 5: Fuzzy similarity matching (last resort)
-        best_match, best_score = self._fuzzy_match(item_lower, all_items)
+        if cheap_item is not None:
+            return cheap_item, cheap_confidence
+        
+        # Fuzzy similarity matching (last resort)
+        best_match, best_score = self._fuzzy_match(item_lower, menu, normalized_query)
         if best_match and best_score >= 0.6:
             logger.info(f"Fuzzy matched '{item_name}' → '{best_match.name}' (score: {best_score:.2f})")
             return best_match, best_score
         
         return None, 0.0
     
-    def _get_keyword_mappings(self) -> List[tuple]:
-        """Get keyword to item type mappings with filters
-        Returns list of (keywords, filter_function) tuples
+    def _cheap_match(self, item_lower: str, normalized_query: str, menu: _MenuIndex) -> tuple:
+        """Exact, substring and keyword strategies (no LLM round trip)
+        
+        Returns:
+            tuple: (menu entry, confidence) or (None, 0.0)
         """
-        def normalize_text(text):
-            """Normalize Arabic text for comparison"""
-            import re
-            # Remove diacritics
-            text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
-            # Normalize alef variations
-            text = text.replace('أ', 'ا').replace('إ', 'ا').replace('آ', 'ا')
-            # Normalize taa marbouta
-            text = text.replace('ة', 'ه')
-            # Normalize yaa variations
-            text = text.replace('ى', 'ي')
-            return text.lower().strip()
-        
-        return [
-            # Burgers - specific types first
-            (['كلاسيكي', 'classic'], 
-             lambda item, query: 'classic' in item.name.lower() and 'burger' in item.name.lower()),
-            (['جبنة', 'جبن', 'cheese'], 
-             lambda item, query: 'cheese' in item.name.lower() and 'burger' in item.name.lower()),
-            (['دجاج', 'chicken'], 
-             lambda item, query: 'chicken' in item.name.lower()),
-            (['نباتي', 'veggie'], 
-             lambda item, query: 'veggie' in item.name.lower()),
-            (['بيكون', 'bacon'], 
-             lambda item, query: 'bacon' in item.name.lower()),
-            # Generic burger (after specific types)
-            (['برجر', 'برغر', 'burger'], 
-             lambda item, query: 'burger' in item.name.lower()),
-            
-            # Pizza types
-            (['ببروني', 'بيبروني', 'pepperoni'], 
-             lambda item, query: 'pepperoni' in item.name.lower()),
-            (['مارجريتا', 'margherita'], 
-             lambda item, query: 'margherita' in item.name.lower()),
-            (['بيتزا', 'pizza'], 
-             lambda item, query: 'pizza' in item.name.lower()),
-            
-            # Sides
-            (['بطاطس', 'بطاطا', 'فرايز', 'فرويز', 'fries'], 
-             lambda item, query: 'fries' in item.name.lower()),
-            (['حلقات', 'بصل', 'onion rings'], 
-             lambda item, query: 'onion' in item.name.lower()),
-            
-            # Beverages
-            (['كولا', 'كوكا', 'cola', 'coca'], 
-             lambda item, query: 'cola' in item.name.lower()),
-            (['مشروب', 'صودا', 'سودا', 'soda'], 
-             lambda item, query: 'soda' in item.name.lower() or item.category == 'Beverages'),
+        # Exact match (highest confidence), one hash probe each
+        menu_item = menu.exact.get(item_lower) or menu.exact.get(normalized_query)
+        if menu_item is not None:
+            return menu_item, 1.0
+        
+        # Direct substring matching (fast and reliable), best score first;
+        # each lookup is a single pass over the query or the joined names
+        # English name contains search term
+        idx = menu.name_substrings.first_containing(item_lower)
+        if idx is not None:
+            return menu.entries[idx], 0.95
+        # Search term contains item name
+        idx = menu.name_substrings.first_contained_in(item_lower)
+        if idx is not None:
+            return menu.entries[idx], 0.93
+        # Arabic name matching, either direction
+        candidates = [
+            idx for idx in (
+                menu.arabic_substrings.first_containing(item_lower),
+                menu.arabic_substrings.first_contained_in(item_lower)
+            ) if idx is not None
         ]
+        if candidates:
+            return menu.entries[min(candidates)], 0.92
+        
+        # Enhanced keyword mapping (specific → general)
+        for pattern, menu_item in menu.keyword_rules:
+            if pattern.search(item_lower):
+                return menu_item, 0.88
+        
+        return None, 0.0
     
-    def _fuzzy_match(self, query: str, menu_items: List[MenuItem]) -> tuple:
+    def _fuzzy_match(self, query: str, menu: _MenuIndex, normalized_query: Optional[str] = None) -> tuple:
         """Calculate fuzzy similarity scores for all items
         
+        Args:
+            normalized_query: normalize_arabic(query) if the caller already has it
+        
         Returns:
             tuple: (best_match, best_score) or (None, 0.0)
         """
-        import re
-        
-        def normalize_arabic(text):
-            text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
-            text = text.replace('أ', 'ا').replace('إ', 'ا').replace('آ', 'ا')
-            text = text.replace('ة', 'ه').replace('ى', 'ي')
-            return text.lower().strip()
-        
-        def calc_similarity(s1, s2):
-            """Calculate word overlap similarity"""
-            words1 = set(s1.split())
-            words2 = set(s2.split())
-            
+        def calc_similarity(s1, words1, s2, words2):
+            """Calculate word overlap similarity from precomputed word sets"""
             if not words1 or not words2:
                 return 0.0
             
@@ -850,54 +1281,57 @@ Return [] if no items found.'''
             
             return 0.0
         
-        normalized_query = normalize_arabic(query)
+        # Split the query once instead of once per menu item
+        query_words = set(query.split())
+        if normalized_query is None:
+            normalized_query = normalize_arabic(query)
+        normalized_query_words = set(normalized_query.split())
         best_match = None
         best_score = 0.0
         
-        for item in menu_items:
+        for item, name_lower, name_words, normalized_item, normalized_words in zip(
+            menu.entries, menu.names_lower, menu.name_words, menu.arabic_norm, menu.arabic_norm_words
+        ):
             # Check English name
-            score = calc_similarity(query, item.name.lower())
+            score = calc_similarity(query, query_words, name_lower, name_words)
             if score > best_score:
                 best_score = score
                 best_match = item
             
             # Check Arabic name
-            if item.arabic_name:
-                normalized_item = normalize_arabic(item.arabic_name)
-                score = calc_similarity(normalized_query, normalized_item)
+            if normalized_item is not None:
+                score = calc_similarity(normalized_query, normalized_query_words, normalized_item, normalized_words)
                 if score > best_score:
                     best_score = score
                     best_match = item
         
         return best_match, best_score
     
-    def _llm_based_menu_matching(self, user_input: str, menu_items: List[MenuItem]) -> tuple[MenuItem, float]:
+    def _llm_based_menu_matching(self, user_input: str, menu: _MenuIndex) -> tuple:
         """Use LLM to intelligently match user input to menu items with confidence
         
+        Answers are cached per menu snapshot (see _prefetch_llm_matches for the
+        batched variant that fills the same cache).
+        
         Args:
             user_input: What the user said
-            menu_items: List of available menu items
+            menu: Available menu index
             
         Returns:
-            tuple[MenuItem, float]: (best match, confidence) or (None, 0.0)
+            tuple: (best match, confidence) or (None, 0.0)
         """
-        from langchain.schema import HumanMessage
+        key = _menu_match_key(user_input)
+        cached = menu.llm_matches.get(key)
+        if cached is not None:
+            return cached
         
-        # Build compact menu representation
-        menu_repr = []
-        for idx, item in enumerate(menu_items):
-            menu_repr.append({
-                "id": idx,
-                "name": item.name,
-                "arabic_name": item.arabic_name,
-                "category": item.category
-            })
+        from langchain.schema import HumanMessage
         
         prompt = f"""Match user input to menu item. Consider Arabic spelling variations, typos, and phonetic similarities.
 
 User said: "{user_input}"
 
-Available items: {json.dumps(menu_repr, ensure_ascii=False)}
+Available items: {menu.menu_json}
 
 Return JSON ONLY:
 {{
@@ -906,55 +1340,110 @@ Return JSON ONLY:
   "reasoning": "why this match"
 }}
 
-Confidence guide:
-- 1.0: Perfect exact match
-- 0.9: Very likely (minor spelling variation)
-- 0.7: Probable (phonetic similarity, common typo)
-- 0.5: Possible but uncertain
-- 0.3: Weak match
-- 0.0: No match"""
+{_LLM_MATCH_CONFIDENCE_GUIDE}"""
         
         try:
             response = self.llm.invoke([HumanMessage(content=prompt)])
-            result = json.loads(response.content.strip())
-            
-            match_id = result.get("match_id")
-            confidence = float(result.get("confidence", 0.0))
+            result = json_codec.loads(response.content.strip())
             reasoning = result.get("reasoning", "")
             
-            if match_id is not None and 0 <= match_id < len(menu_items):
-                matched_item = menu_items[match_id]
+            match = self._store_llm_match(menu, key, result)
+            if match[0] is not None:
                 logger.info(f"LLM match reasoning: {reasoning}")
-                return matched_item, confidence
-            else:
-                return None, 0.0
+            return match
                 
         except Exception as e:
             logger.error(f"LLM matching error: {e}")
             return None, 0.0
     
+    def _store_llm_match(self, menu: _MenuIndex, key: str, result: Dict) -> tuple:
+        """Resolve an LLM {match_id, confidence} answer and cache it on the menu"""
+        match_id = result.get("match_id")
+        if isinstance(match_id, int) and 0 <= match_id < len(menu.entries):
+            match = (menu.entries[match_id], float(result.get("confidence", 0.0)))
+        else:
+            match = (None, 0.0)
+        if len(menu.llm_matches) < _LLM_MATCH_CACHE_SIZE:
+            menu.llm_matches[key] = match
+        return match
+    
+    def _prefetch_llm_matches(self, item_names: List[str], menu: _MenuIndex) -> None:
+        """Resolve several item names with one LLM call instead of one call each
+        
+        Only names that cheaper lookups cannot settle are sent. Results land in
+        the snapshot's LLM match cache, where _llm_based_menu_matching finds them;
+        on any failure the per-item calls simply happen as before.
+        """
+        pending = {}
+        for name in item_names:
+            if not isinstance(name, str) or not name.strip():
+                continue
+            key = _menu_match_key(name)
+            if key in pending or key in menu.llm_matches or key in _menu_match_cache["entries"]:
+                continue
+            item_lower = name.lower().strip()
+            _, confidence = self._cheap_match(item_lower, normalize_arabic(item_lower), menu)
+            if confidence >= self.cheap_match_threshold:
+                continue
+            pending[key] = name
+        
+        if len(pending) < 2:
+            return
+        
+        from langchain.schema import HumanMessage
+        
+        prompt = f"""Match each user input to a menu item. Consider Arabic spelling variations, typos, and phonetic similarities.
+
+User inputs: {json_codec.dumps(list(pending.values()))}
+
+Available items: {menu.menu_json}
+
+Return a JSON array ONLY, one object per user input in the same order:
+[{{"match_id": <id or null>, "confidence": <0.0-1.0>}}]
+
+{_LLM_MATCH_CONFIDENCE_GUIDE}"""
+        
+        try:
+            response = self.llm.invoke([HumanMessage(content=prompt)])
+            results = json_codec.loads(response.content.strip())
+            if not isinstance(results, list) or len(results) != len(pending):
+                logger.warning("Batched LLM matching returned %s results for %d inputs",
+                               len(results) if isinstance(results, list) else "no", len(pending))
+                return
+            for key, result in zip(pending, results):
+                if isinstance(result, dict):
+                    self._store_llm_match(menu, key, result)
+        except Exception as e:
+            logger.warning(f"Batched LLM matching failed: {e}")
+    
     def _aggregate_items(self, items: List[Dict]) -> List[Dict]:
-        """Aggregate duplicate items by ID, combining quantities"""
+        """Aggregate duplicate items by ID, combining quantities
+        
+        Merges in place: the first dict per ID is reused, so callers pass items
+        they own (e.g. from _load_draft, which already copies them).
+        """
         aggregated = {}
         for item in items:
-            item_id = item["id"]
-            if item_id in aggregated:
-                aggregated[item_id]["quantity"] += item["quantity"]
+            existing = aggregated.get(item["id"])
+            if existing is not None:
+                existing["quantity"] += item["quantity"]
             else:
-                aggregated[item_id] = item.copy()
+                aggregated[item["id"]] = item
         return list(aggregated.values())
     
     def _calculate_totals(self, items: List[Dict]) -> Dict:
-        subtotal = sum(item["price"] * item["quantity"] for item in items)
-        tax = subtotal * 0.15  # 15% KSA tax rate
-        delivery_fee = 0.0  # No delivery fee for drive-thru pickup
-        total = subtotal + tax + delivery_fee
+        # Drafts hold a handful of lines, so a plain generator sum beats any
+        # array/JIT setup cost. Prices become halalas once per line; everything
+        # after that is exact integer math, and total == subtotal + tax + fee.
+        subtotal = sum(round(item["price"] * 100) * item["quantity"] for item in items)
+        tax = (subtotal * _TAX_PERCENT + 50) // 100  # round half up to the halala
+        total = subtotal + tax + _DELIVERY_FEE_HALALAS
         
         return {
-            "subtotal": round(subtotal, 2),
-            "tax": round(tax, 2),
-            "delivery_fee": delivery_fee,
-            "total": round(total, 2)
+            "subtotal": subtotal / 100,
+            "tax": tax / 100,
+            "delivery_fee": _DELIVERY_FEE_HALALAS / 100,
+            "total": total / 100
         }
     
     def _format_order_summary(self, draft: Dict) -> str:
@@ -986,24 +1475,20 @@ Confidence guide:
         Returns:
             Parsed dictionary or empty dict if parsing fails
         """
-        import re
-        
         if not text or not text.strip():
             return {}
             
         try:
             # First try direct JSON parsing
-            return json.loads(text.strip())
-        except json.JSONDecodeError:
+            return json_codec.loads(text.strip())
+        except json_codec.JSONDecodeError:
             try:
                 # Try to extract JSON from text that might have extra content
-                # Look for JSON-like patterns with nested braces
-                json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-                matches = re.findall(json_pattern, text)
-                for match in matches:
+                # Try each balanced {...} span in order
+                for match in _iter_json_objects(text):
                     try:
-                        return json.loads(match)
-                    except json.JSONDecodeError:
+                        return json_codec.loads(match)
+                    except json_codec.JSONDecodeError:
                         continue
                         
                 # Try to extract content between first { and last }
@@ -1011,7 +1496,7 @@ Confidence guide:
                 end_idx = text.rfind('}')
                 if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
                     json_text = text[start_idx:end_idx+1]
-                    return json.loads(json_text)
+                    return json_codec.loads(json_text)
                     
                 logger.warning(f"Could not extract valid JSON from: {text}")
                 return {}
@@ -1022,24 +1507,7 @@ Confidence guide:
     def _filter_message_for_add_only(self, message: str) -> str:
         """Filter message to extract only the ADD part, removing REMOVE keywords and items"""
         try:
-            import re
-            
-            # Find the add part of the message (after واضف or add keywords)
-            add_keywords = ['واضف', 'أضف', 'اضف', 'أريد', 'and add', 'add']
-            
-            for keyword in add_keywords:
-                # Look for pattern like 'واضف بطاطس' or 'add fries'
-                pattern = rf'{keyword}\s+(.+?)$'
-                match = re.search(pattern, message, re.IGNORECASE)
-                if match:
-                    add_part = match.group(1).strip()
-                    # Clean up common separators
-                    add_part = re.sub(r'[,،وو]+$', '', add_part)
-                    return add_part
-            
-            # Fallback: return the original message
-            return message
-            
+            return _add_only_part(message)
         except Exception as e:
             logger.error(f"Error filtering message for add-only: {e}")
             return message
@@ -1047,24 +1515,7 @@ Confidence guide:
     def _extract_items_to_remove(self, message: str) -> List[str]:
         """Extract items to remove from compound messages"""
         try:
-            # Look for remove patterns and extract items after them
-            import re
-            
-            # Split message around remove keywords
-            remove_keywords = ['احذف', 'حذف', 'شيل', 'remove', 'delete']
-            
-            items_to_remove = []
-            for keyword in remove_keywords:
-                # Find patterns like 'احذف المشروب' or 'احذف 1 مشروب غازي'
-                pattern = rf'{keyword}\s+(?:\d+\s+)?([\u0600-\u06FF\w\s]+?)(?:،|و|واضف|add|want|$)'
-                matches = re.findall(pattern, message, re.IGNORECASE)
-                for match in matches:
-                    # Clean up the match and add to removal list
-                    cleaned = match.strip().rstrip('،و')
-                    if cleaned:
-                        items_to_remove.append(cleaned)
-            
-            return items_to_remove
+            return list(_items_to_remove(message))
         except Exception as e:
             logger.error(f"Error extracting items to remove: {e}")
             return []
@@ -1086,91 +1537,61 @@ Confidence guide:
             
             item_lower = item_name.lower().strip()
             
-            # Normalize Arabic text
-            def normalize_arabic(text):
-                import re
-                arabic_diacritics = re.compile(r'[\u064B-\u065F\u0670]')
-                text = arabic_diacritics.sub('', text)
-                text = text.replace('أ', 'ا').replace('إ', 'ا').replace('آ', 'ا')
-                text = text.replace('ة', 'ه')
-                return text.lower().strip()
-            
             normalized_item = normalize_arabic(item_lower)
             
-            # Enhanced category mappings
-            category_hints = {
-                'فرويز': 'Sides',
-                'فرايز': 'Sides',
-                'بطاطس': 'Sides',
-                'بطاطا': 'Sides',
-                'سودا': 'Beverages',
-                'صودا': 'Beverages',
-                'مشروب': 'Beverages',
-                'عصير': 'Beverages',
-                'برجر': 'Burgers',
-                'برغر': 'Burgers',
-                'بيتزا': 'Pizza',
-                'دجاج': 'Chicken',
-                'وينجز': 'Sides',
-                'أجنحة': 'Sides',
-                'سلطة': 'Sides'
-            }
-            
             suggestions = []
             matched_categories = []
             
-            # Find categories based on keywords
-            for hint, category in category_hints.items():
-                if normalize_arabic(hint) in normalized_item or normalized_item in normalize_arabic(hint):
+            # Find categories based on keywords (each category once)
+            for hint, category in _CATEGORY_HINTS:
+                if category not in matched_categories and (hint in normalized_item or normalized_item in hint):
                     matched_categories.append(category)
             
+            menu = self._menu_index()
+            all_items = menu.entries
+            
             # Get items from matched categories
-            if matched_categories:
-                for category in matched_categories:
-                    items = self.db.query(MenuItem).filter(
-                        MenuItem.category == category,
-                        MenuItem.is_available == True
-                    ).limit(3).all()
-                    suggestions.extend([item.arabic_name or item.name for item in items])
-                    if len(suggestions) >= 3:
-                        break
+            for category in matched_categories:
+                suggestions.extend(menu.category_names.get(category, ()))
+                if len(suggestions) >= 3:
+                    break
             
             # If no category match, try fuzzy matching on all items
             if not suggestions:
-                def similarity_score(s1, s2):
-                    s1, s2 = normalize_arabic(s1), normalize_arabic(s2)
-                    if s1 in s2 or s2 in s1:
+                normalized_words = set(normalized_item.split())
+                
+                def similarity_score(s2, words2):
+                    if normalized_item in s2 or s2 in normalized_item:
                         return 0.8
-                    words1 = set(s1.split())
-                    words2 = set(s2.split())
-                    if words1 & words2:
-                        return len(words1 & words2) / max(len(words1), len(words2)) * 0.6
+                    if normalized_words & words2:
+                        return len(normalized_words & words2) / max(len(normalized_words), len(words2)) * 0.6
                     return 0.0
                 
-                all_items = self.db.query(MenuItem).filter(
-                    MenuItem.is_available == True
-                ).all()
+                def score_items(indexes):
+                    scored = []
+                    for idx in indexes:
+                        arabic_norm = menu.arabic_norm[idx]
+                        if arabic_norm is not None:
+                            score = similarity_score(arabic_norm, menu.arabic_norm_words[idx])
+                            if score > 0.3:
+                                scored.append((score, all_items[idx].arabic_name))
+                    return scored
                 
-                scored_items = []
-                for item in all_items:
-                    if item.arabic_name:
-                        score = similarity_score(item_lower, item.arabic_name)
-                        if score > 0.3:
-                            scored_items.append((score, item.arabic_name or item.name))
+                # Usually a partial or misspelled word: score only items with a
+                # word starting with one of the query's, scanning everything
+                # only when that finds nothing
+                scored_items = score_items(menu.prefix_candidates(normalized_words))
+                if not scored_items:
+                    scored_items = score_items(range(len(all_items)))
                 
-                # Sort by score and take top 3
-                scored_items.sort(reverse=True)
-                suggestions = [name for _, name in scored_items[:3]]
+                # Top 3 by score without sorting the whole list
+                suggestions = [name for _, name in heapq.nlargest(3, scored_items)]
             
             # If still no suggestions, return popular items from common categories
             if not suggestions:
                 popular_categories = ['Burgers', 'Sides', 'Beverages']
                 for category in popular_categories:
-                    items = self.db.query(MenuItem).filter(
-                        MenuItem.category == category,
-                        MenuItem.is_available == True
-                    ).limit(1).all()
-                    suggestions.extend([item.arabic_name or item.name for item in items])
+                    suggestions.extend(menu.category_names.get(category, ())[:1])
                     if len(suggestions) >= 3:
                         break
             
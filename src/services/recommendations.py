@@ -3,21 +3,23 @@ from typing import List, Dict
 class RecommendationEngine:
     def __init__(self):
         self.rules = {
-            "Burgers": ["Fries", "Onion Rings", "Soda", "Milkshake"],
-            "Pizza": ["Garlic Bread", "Wings", "Soda", "Salad"],
-            "Sides": ["Soda", "Dipping Sauce"],
-            "Beverages": ["Dessert"],
+            "Burgers": ("Fries", "Onion Rings", "Soda", "Milkshake"),
+            "Pizza": ("Garlic Bread", "Wings", "Soda", "Salad"),
+            "Sides": ("Soda", "Dipping Sauce"),
+            "Beverages": ("Dessert",),
         }
     
     def get_recommendations(self, items: List[Dict]) -> List[str]:
         recommendations = []
-        existing_items = [item["name"] for item in items]
+        # Items already ordered plus recommendations so far, for O(1) membership
+        seen = {item["name"] for item in items}
         
         for item in items:
-            category = item.get("category", "")
-            if category in self.rules:
-                for rec in self.rules[category]:
-                    if rec not in existing_items and rec not in recommendations:
-                        recommendations.append(rec)
+            for rec in self.rules.get(item.get("category", ""), ()):
+                if rec not in seen:
+                    seen.add(rec)
+                    recommendations.append(rec)
+                    if len(recommendations) >= 3:
+                        return recommendations
         
-        return recommendations[:3]
+        return recommendations
@@ -5,6 +5,12 @@ from typing import Optional
 class PolicyEngine:
     def __init__(self, max_auto_refund: float = 50.0):
         self.max_auto_refund = max_auto_refund
+        self._handlers = {
+            IssueType.MISSING_ITEM: self._resolve_missing_item,
+            IssueType.LATE_DELIVERY: self._resolve_late_delivery,
+            IssueType.WRONG_ORDER: self._resolve_wrong_order,
+            IssueType.QUALITY: self._resolve_quality,
+        }
     
     def resolve(
         self,
@@ -12,73 +18,75 @@ class PolicyEngine:
         order_total: float = 0,
         delay_minutes: int = 0
     ) -> PolicyResolution:
-        
-        if issue_type == IssueType.MISSING_ITEM:
-            if order_total <= self.max_auto_refund:
-                return PolicyResolution(
-                    can_auto_resolve=True,
-                    resolution_message=f"استرداد كامل بقيمة {order_total:.2f} SAR تم إصداره للعنصر المفقود",
-                    compensation_amount=order_total,
-                    requires_escalation=False
-                )
-            else:
-                return PolicyResolution(
-                    can_auto_resolve=False,
-                    resolution_message="Order value exceeds auto-refund limit, escalating to supervisor",
-                    requires_escalation=True
-                )
-        
-        elif issue_type == IssueType.LATE_DELIVERY:
-            if delay_minutes > 30:
-                credit = min(order_total * 0.2, 25.0)
-                return PolicyResolution(
-                    can_auto_resolve=True,
-                    resolution_message=f"رصيد {credit:.2f} SAR تم إضافته بسبب تأخير التوصيل",
-                    compensation_amount=credit,
-                    requires_escalation=False
-                )
-            else:
-                return PolicyResolution(
-                    can_auto_resolve=True,
-                    resolution_message="Delivery is within acceptable range, no compensation required",
-                    compensation_amount=0,
-                    requires_escalation=False
-                )
-        
-        elif issue_type == IssueType.WRONG_ORDER:
-            if order_total <= 75:
-                return PolicyResolution(
-                    can_auto_resolve=True,
-                    resolution_message=f"استرداد كامل بقيمة {order_total:.2f} SAR تم إصداره، مع عرض بديل",
-                    compensation_amount=order_total,
-                    requires_escalation=False
-                )
-            else:
-                return PolicyResolution(
-                    can_auto_resolve=False,
-                    resolution_message="High-value order, escalating for manual review",
-                    requires_escalation=True
-                )
-        
-        elif issue_type == IssueType.QUALITY:
-            if order_total <= 30:
-                compensation = order_total * 0.5
-                return PolicyResolution(
-                    can_auto_resolve=True,
-                    resolution_message=f"استرداد 50% بقيمة {compensation:.2f} SAR تم إصداره بسبب مشكلة الجودة",
-                    compensation_amount=compensation,
-                    requires_escalation=False
-                )
-            else:
-                return PolicyResolution(
-                    can_auto_resolve=False,
-                    resolution_message="Quality issue requires manager review",
-                    requires_escalation=True
-                )
-        
+        handler = self._handlers.get(issue_type, self._resolve_default)
+        return handler(order_total, delay_minutes)
+    
+    def _resolve_missing_item(self, order_total: float, delay_minutes: int) -> PolicyResolution:
+        if order_total <= self.max_auto_refund:
+            return PolicyResolution(
+                can_auto_resolve=True,
+                resolution_message=f"استرداد كامل بقيمة {order_total:.2f} SAR تم إصداره للعنصر المفقود",
+                compensation_amount=order_total,
+                requires_escalation=False
+            )
+        else:
+            return PolicyResolution(
+                can_auto_resolve=False,
+                resolution_message="Order value exceeds auto-refund limit, escalating to supervisor",
+                requires_escalation=True
+            )
+    
+    def _resolve_late_delivery(self, order_total: float, delay_minutes: int) -> PolicyResolution:
+        if delay_minutes > 30:
+            credit = min(order_total * 0.2, 25.0)
+            return PolicyResolution(
+                can_auto_resolve=True,
+                resolution_message=f"رصيد {credit:.2f} SAR تم إضافته بسبب تأخير التوصيل",
+                compensation_amount=credit,
+                requires_escalation=False
+            )
+        else:
+            return PolicyResolution(
+                can_auto_resolve=True,
+                resolution_message="Delivery is within acceptable range, no compensation required",
+                compensation_amount=0,
+                requires_escalation=False
+            )
+    
+    def _resolve_wrong_order(self, order_total: float, delay_minutes: int) -> PolicyResolution:
+        if order_total <= 75:
+            return PolicyResolution(
+                can_auto_resolve=True,
+                resolution_message=f"استرداد كامل بقيمة {order_total:.2f} SAR تم إصداره، مع عرض بديل",
+                compensation_amount=order_total,
+                requires_escalation=False
+            )
         else:
             return PolicyResolution(
                 can_auto_resolve=False,
-                resolution_message="Issue requires manual review",
+                resolution_message="High-value order, escalating for manual review",
                 requires_escalation=True
             )
+    
+    def _resolve_quality(self, order_total: float, delay_minutes: int) -> PolicyResolution:
+        if order_total <= 30:
+            compensation = order_total * 0.5
+            return PolicyResolution(
+                can_auto_resolve=True,
+                resolution_message=f"استرداد 50% بقيمة {compensation:.2f} SAR تم إصداره بسبب مشكلة الجودة",
+                compensation_amount=compensation,
+                requires_escalation=False
+            )
+        else:
+            return PolicyResolution(
+                can_auto_resolve=False,
+                resolution_message="Quality issue requires manager review",
+                requires_escalation=True
+            )
+    
+    def _resolve_default(self, order_total: float, delay_minutes: int) -> PolicyResolution:
+        return PolicyResolution(
+            can_auto_resolve=False,
+            resolution_message="Issue requires manual review",
+            requires_escalation=True
+        )
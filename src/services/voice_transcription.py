@@ -1,19 +1,67 @@
 """
 Voice Transcription Service using Local Whisper Model
 Optimized for Arabic language transcription
-Uses locally installed Whisper from https://github.com/openai/whisper
+Uses faster-whisper (CTranslate2, INT8 weights) when installed, otherwise the
+locally installed Whisper from https://github.com/openai/whisper
 
 OPTIMIZATION: Singleton pattern for Whisper model to avoid reloading on every request
 """
-import whisper
+import asyncio
+import hashlib
+import io
+import subprocess
 import tempfile
+import threading
 import os
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
 from src.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import ctranslate2
+    from faster_whisper import WhisperModel
+except ImportError:  # pragma: no cover - depends on the environment
+    WhisperModel = None
+    import torch
+    import whisper
+    logger.info("faster-whisper not installed, using openai-whisper")
+
+# Default prompt for Arabic food ordering context
+_DEFAULT_PROMPT = "طلب طعام، برجر، بيتزا، بطاطس، مشروب"
+
+# Speech pregate: 30 ms frames at 16 kHz; fewer than _MIN_SPEECH_FRAMES frames
+# above roughly -40 dBFS RMS is treated as silence and never reaches the model
+_VAD_FRAME = 480
+_SPEECH_RMS_THRESHOLD = 0.01
+_MIN_SPEECH_FRAMES = 3
+
+# Containers whose index may sit at the end of the file; ffmpeg cannot decode
+# those from a non-seekable pipe, so they still go through a temp file
+_UNPIPEABLE_SUFFIXES = frozenset({'.mp4', '.m4a', '.mov', '.3gp'})
+
+# Put those temp files on tmpfs when available so uploads never touch disk
+_TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Successful results by (audio digest, language): retried uploads and repeated
+# clips skip decoding and inference (greedy decoding is deterministic)
+_transcription_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_TRANSCRIPTION_CACHE_SIZE = 512
+_transcription_cache_lock = threading.Lock()  # callers may be on any thread
+
+# Detected language by audio digest, for repeated detect_language calls
+_language_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_LANGUAGE_CACHE_SIZE = 256
+_language_cache_lock = threading.Lock()
+
+# Inference runs off the event loop on one worker: the shared model is not
+# safe to run concurrently, and one GPU gains nothing from more threads
+_WHISPER_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+
 # Singleton instance for the transcription service
 _transcription_service_instance = None
 _whisper_model = None
@@ -30,22 +78,105 @@ def _get_whisper_model():
     global _whisper_model
     if _whisper_model is None:
         model_size = settings.whisper_model_size
-        logger.info(f"Loading Whisper model ({model_size})... (one-time initialization)")
-        print(f"Loading Whisper model ({model_size})...")
-        _whisper_model = whisper.load_model(model_size)
-        logger.info(f"Whisper model ({model_size}) loaded successfully!")
-        print(f"Whisper model ({model_size}) loaded successfully!")
+        logger.info("Loading Whisper model (%s)... (one-time initialization)", model_size)
+        if WhisperModel is not None:
+            # INT8 weights: ~4x less memory traffic than FP32 on CPU, tensor cores on GPU
+            if ctranslate2.get_cuda_device_count() > 0:
+                _whisper_model = WhisperModel(model_size, device="cuda", compute_type="int8_float16")
+            else:
+                _whisper_model = WhisperModel(model_size, device="cpu", compute_type="int8")
+        else:
+            if torch.cuda.is_available():
+                # TF32 tensor-core GEMMs on Ampere+; cudnn autotuning is safe because
+                # mel inputs are always padded/trimmed to the same shape
+                torch.backends.cuda.matmul.allow_tf32 = True
+                torch.backends.cudnn.allow_tf32 = True
+                torch.backends.cudnn.benchmark = True
+            _whisper_model = whisper.load_model(model_size, device="cuda" if torch.cuda.is_available() else "cpu").eval()
+            if settings.whisper_torch_compile and _whisper_model.device.type == "cuda":
+                # CUDA-graph capture removes the per-token launch overhead of the
+                # autoregressive decoder; compilation happens during warmup()
+                _whisper_model.decoder.forward = torch.compile(
+                    _whisper_model.decoder.forward, mode="reduce-overhead"
+                )
+        logger.info("Whisper model (%s) loaded successfully!", model_size)
     return _whisper_model
 
 
+def _decode_to_float32(audio_bytes: bytes) -> np.ndarray:
+    """Decode audio bytes to 16 kHz mono float32 samples through an ffmpeg pipe
+    
+    Same conversion as whisper.audio.load_audio, minus the file round-trip.
+    """
+    cmd = [
+        "ffmpeg", "-threads", "0", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", "16000", "-"
+    ]
+    try:
+        out = subprocess.run(cmd, input=audio_bytes, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='replace')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def _has_speech(audio: np.ndarray) -> bool:
+    """Cheap energy-based voice activity check on 16 kHz float32 samples"""
+    n_frames = len(audio) // _VAD_FRAME
+    if n_frames == 0:
+        return False
+    frames = audio[:n_frames * _VAD_FRAME].reshape(n_frames, _VAD_FRAME)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return int(np.count_nonzero(rms > _SPEECH_RMS_THRESHOLD)) >= _MIN_SPEECH_FRAMES
+
+
+def _upload_suffix(filename: Optional[str]) -> str:
+    """Lowercased extension of an upload filename, '.webm' when it has none (filenames may be missing)"""
+    _, dot, ext = (filename or "").rpartition('.')
+    return f".{ext.lower()}" if dot and ext else '.webm'
+
+
 class VoiceTranscriptionService:
     def __init__(self):
         # Use singleton model - only loads once across all instances
         self.model = _get_whisper_model()
+        # openai-whisper: half precision on GPU (tensor cores), fp32 on CPU where fp16 is unsupported
+        self.fp16 = WhisperModel is None and self.model.device.type == "cuda"
+        self._warmed = False
+    
+    def warmup(self) -> None:
+        """Run one throwaway transcription so the first real request skips
+        kernel selection and lazy initialization (runs once per process)"""
+        if self._warmed:
+            return
+        self._warmed = True
+        # One second of silence with the Arabic ordering prompt; a compiled
+        # decoder needs a second pass before graphs are captured
+        compiled = WhisperModel is None and settings.whisper_torch_compile and self.model.device.type == "cuda"
+        for _ in range(2 if compiled else 1):
+            self._run_model(
+                np.zeros(16000, dtype=np.float32),
+                language="ar",
+                initial_prompt=_DEFAULT_PROMPT
+            )
+    
+    async def awarmup(self) -> None:
+        """warmup on the Whisper worker thread, which is where inference runs"""
+        await asyncio.get_running_loop().run_in_executor(_WHISPER_POOL, self.warmup)
+    
+    def _run_model(self, audio, **options) -> Tuple[str, Optional[str]]:
+        """Run the loaded backend and return (text, detected language)"""
+        if WhisperModel is not None:
+            # Greedy decoding like openai-whisper's default; VAD skips silent stretches
+            segments, info = self.model.transcribe(audio, beam_size=1, vad_filter=True, **options)
+            return " ".join(segment.text for segment in segments).strip(), info.language
+        # inference_mode skips autograd version-counter tracking on every op
+        with torch.inference_mode():
+            result = self.model.transcribe(audio, fp16=self.fp16, **options)
+        return result["text"].strip(), result.get("language")
     
     def transcribe(
         self, 
-        audio_path: str, 
+        audio_path, 
         language: str = "ar",
         prompt: Optional[str] = None
     ) -> dict:
@@ -53,7 +184,8 @@ class VoiceTranscriptionService:
         Transcribe audio to text using local Whisper model
         
         Args:
-            audio_path: Path to audio file
+            audio_path: Path to audio file, 16 kHz float32 samples, or a binary file object
+                (file objects need the faster-whisper backend)
             language: Language code (default: 'ar' for Arabic)
             prompt: Optional context prompt to improve accuracy
             
@@ -63,20 +195,18 @@ class VoiceTranscriptionService:
         try:
             # Default prompt for Arabic food ordering context
             if not prompt:
-                prompt = "طلب طعام، برجر، بيتزا، بطاطس، مشروب"
+                prompt = _DEFAULT_PROMPT
             
-            print(f"Transcribing audio file: {audio_path}")
+            if isinstance(audio_path, str):
+                logger.debug("Transcribing audio file: %s", audio_path)
             
             # Transcribe using local Whisper model
-            result = self.model.transcribe(
+            transcribed_text, detected_lang = self._run_model(
                 audio_path,
                 language=language,
-                initial_prompt=prompt,
-                fp16=False  # Use fp32 for better compatibility
+                initial_prompt=prompt
             )
             
-            transcribed_text = result["text"].strip()
-            
             # # Check audio duration and transcription length
             # duration = result.get("duration", 0)
             # if duration < 0.2:  # Less than 0.2 seconds
@@ -96,16 +226,16 @@ class VoiceTranscriptionService:
             #         "language": language
             #     }
             
-            print(f"Transcription successful: {transcribed_text[:100]}...")
+            logger.debug("Transcription successful: %.100s", transcribed_text)
             
             return {
                 "text": transcribed_text,
-                "language": result.get("language", language),
+                "language": detected_lang or language,
                 "success": True
             }
             
         except Exception as e:
-            print(f"Transcription error: {str(e)}")
+            logger.error("Transcription error: %s", e)
             return {
                 "text": "",
                 "language": language,
@@ -130,17 +260,68 @@ class VoiceTranscriptionService:
         Returns:
             Transcription result dict
         """
-        # Save bytes to temporary file since local Whisper needs a file path
+        cache_key = (hashlib.blake2b(audio_bytes, digest_size=16).digest(), language)
+        with _transcription_cache_lock:
+            cached = _transcription_cache.get(cache_key)
+            if cached is not None:
+                _transcription_cache.move_to_end(cache_key)
+                return dict(cached)
+        
+        result = self._transcribe_bytes_uncached(audio_bytes, filename, language)
+        if result.get("success"):
+            with _transcription_cache_lock:
+                _transcription_cache[cache_key] = dict(result)
+                if len(_transcription_cache) > _TRANSCRIPTION_CACHE_SIZE:
+                    _transcription_cache.popitem(last=False)
+        return result
+    
+    async def atranscribe_from_bytes(
+        self,
+        audio_bytes: bytes,
+        filename: str = "audio.webm",
+        language: str = "ar"
+    ) -> dict:
+        """transcribe_from_bytes on the Whisper worker thread, for async endpoints"""
+        return await asyncio.get_running_loop().run_in_executor(
+            _WHISPER_POOL, self.transcribe_from_bytes, audio_bytes, filename, language
+        )
+    
+    def _transcribe_bytes_uncached(self, audio_bytes: bytes, filename: str, language: str) -> dict:
+        # Decode in memory: faster-whisper reads file objects directly (PyAV),
+        # openai-whisper takes samples decoded through an ffmpeg pipe
+        if WhisperModel is not None:
+            return self.transcribe(io.BytesIO(audio_bytes), language=language)
+        
+        # ffmpeg probes the format itself; the suffix only picks pipe vs temp file
+        suffix = _upload_suffix(filename)
+        if suffix not in _UNPIPEABLE_SUFFIXES:
+            try:
+                audio = _decode_to_float32(audio_bytes)
+            except Exception as e:
+                logger.error("Transcription error: %s", e)
+                return {
+                    "text": "",
+                    "language": language,
+                    "success": False,
+                    "error": str(e)
+                }
+            if not _has_speech(audio):
+                return {
+                    "text": "",
+                    "language": language,
+                    "success": False,
+                    "error": "No speech detected. Please speak clearly."
+                }
+            return self.transcribe(audio, language=language)
+        
+        # Save bytes to temporary file for containers ffmpeg cannot stream
         temp_file = None
         try:
             # Create temporary file with appropriate extension
-            suffix = os.path.splitext(filename)[1] or '.webm'
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=_TEMP_DIR)
             temp_file.write(audio_bytes)
             temp_file.close()
             
-            print(f"Saved audio to temp file: {temp_file.name} ({len(audio_bytes)} bytes)")
-            
             # Transcribe the temporary file
             result = self.transcribe(temp_file.name, language=language)
             
@@ -151,9 +332,20 @@ class VoiceTranscriptionService:
             if temp_file and os.path.exists(temp_file.name):
                 try:
                     os.unlink(temp_file.name)
-                    print(f"Cleaned up temp file: {temp_file.name}")
                 except Exception as e:
-                    print(f"Warning: Could not delete temp file: {e}")
+                    logger.warning("Could not delete temp file %s: %s", temp_file.name, e)
+    
+    def _detect_with_model(self, audio_path: str) -> Optional[str]:
+        """Language detection only: one encoder pass plus the language-token step"""
+        if WhisperModel is not None:
+            # Segments are generated lazily; not consuming them skips decoding
+            _, info = self.model.transcribe(audio_path)
+            return info.language
+        audio = whisper.pad_or_trim(whisper.load_audio(audio_path))
+        mel = whisper.log_mel_spectrogram(audio, n_mels=self.model.dims.n_mels).to(self.model.device)
+        with torch.inference_mode():
+            _, probs = self.model.detect_language(mel)
+        return max(probs, key=probs.get)
     
     def detect_language(self, audio_path: str) -> str:
         """
@@ -166,12 +358,70 @@ class VoiceTranscriptionService:
             Language code (e.g., 'ar', 'en')
         """
         try:
-            # Transcribe without language constraint to detect it
-            result = self.model.transcribe(audio_path, fp16=False)
-            detected_lang = result.get('language', 'ar')
-            print(f"Detected language: {detected_lang}")
+            with open(audio_path, 'rb') as f:
+                cache_key = hashlib.blake2b(f.read(), digest_size=16).digest()
+            with _language_cache_lock:
+                cached = _language_cache.get(cache_key)
+                if cached is not None:
+                    _language_cache.move_to_end(cache_key)
+                    return cached
+            
+            detected_lang = self._detect_with_model(audio_path) or 'ar'
+            logger.debug("Detected language: %s", detected_lang)
+            
+            with _language_cache_lock:
+                _language_cache[cache_key] = detected_lang
+                if len(_language_cache) > _LANGUAGE_CACHE_SIZE:
+                    _language_cache.popitem(last=False)
             return detected_lang
             
         except Exception as e:
-            print(f"Language detection error: {e}")
+            logger.error("Language detection error: %s", e)
             return 'ar'  # Default to Arabic
+    
+    def transcribe_batch(self, audio_paths: List[str], language: str = "ar") -> List[dict]:
+        """
+        Transcribe many recordings (e.g. offline complaint processing)
+        
+        With openai-whisper, clips are padded/trimmed to 30 seconds and run
+        through the encoder and greedy decoder as one batch, so kernel launches
+        are amortized across the batch; only the first 30 seconds of each clip
+        are transcribed. faster-whisper transcribes them one by one.
+        
+        Args:
+            audio_paths: Paths to audio files
+            language: Language code
+            
+        Returns:
+            One transcription result dict per path, in order
+        """
+        if WhisperModel is not None:
+            return [self.transcribe(path, language=language) for path in audio_paths]
+        
+        results: List[Optional[dict]] = [None] * len(audio_paths)
+        mels, positions = [], []
+        for idx, path in enumerate(audio_paths):
+            try:
+                audio = whisper.pad_or_trim(whisper.load_audio(path))
+                mels.append(whisper.log_mel_spectrogram(audio, n_mels=self.model.dims.n_mels))
+                positions.append(idx)
+            except Exception as e:
+                logger.error("Transcription error: %s", e)
+                results[idx] = {"text": "", "language": language, "success": False, "error": str(e)}
+        
+        if mels:
+            try:
+                with torch.inference_mode():
+                    decoded = whisper.decode(
+                        self.model,
+                        torch.stack(mels).to(self.model.device),
+                        whisper.DecodingOptions(language=language, prompt=_DEFAULT_PROMPT, fp16=self.fp16)
+                    )
+                for idx, result in zip(positions, decoded):
+                    results[idx] = {"text": result.text.strip(), "language": result.language or language, "success": True}
+            except Exception as e:
+                logger.error("Batch transcription error: %s", e)
+                for idx in positions:
+                    results[idx] = {"text": "", "language": language, "success": False, "error": str(e)}
+        
+        return results
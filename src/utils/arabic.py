@@ -0,0 +1,31 @@
+"""Arabic text normalization shared by keyword matching and menu lookup"""
+import re
+
+# One str.translate pass: drop harakat (U+064B-U+065F), superscript alef
+# (U+0670) and tatweel (U+0640); unify alef/taa-marbuta/alef-maqsura variants
+_ARABIC_NORMALIZATION = str.maketrans({
+    **{chr(code): None for code in range(0x064B, 0x0660)},
+    'ٰ': None,
+    'ـ': None,
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+})
+
+
+def normalize_arabic(text: str) -> str:
+    """Normalize Arabic text for comparison (also lowercases and strips)"""
+    return text.translate(_ARABIC_NORMALIZATION).lower().strip()
+
+
+def keyword_pattern(*keywords: str, normalize: bool = False) -> re.Pattern:
+    """Compile a substring alternation so one C-level scan replaces an any() loop
+
+    With normalize=True the keywords go through normalize_arabic, for matching
+    against a normalized message.
+    """
+    if normalize:
+        keywords = tuple(normalize_arabic(kw) for kw in keywords)
+    return re.compile("|".join(re.escape(kw) for kw in keywords))
@@ -0,0 +1,33 @@
+"""Fast JSON (de)serialization for hot-path blobs (order drafts, history)
+
+Uses orjson when it is installed and falls back to the stdlib json module
+with equivalent compact, non-ASCII-escaping output otherwise.
+"""
+import json
+import logging
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+    logger.info("orjson not installed, using stdlib json")
+
+# orjson.JSONDecodeError subclasses this, so one except clause covers both
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """Serialize to a compact JSON str (suitable for Text columns)"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -1,10 +1,13 @@
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
 from src.config import settings
+import asyncio
+import random
+import threading
 import time
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, Optional, List
 from functools import wraps
 from openai import OpenAI
 
@@ -40,31 +43,51 @@ class CircuitBreaker:
         self.failure_threshold = failure_threshold
         self.timeout = timeout
         self.failures = 0
-        self.last_failure_time = None
+        self.last_failure_time = 0.0  # time.monotonic() of the latest failure
         self.state = "closed"  # closed, open, half_open
     
     def call(self, func, *args, **kwargs):
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._record_failure()
+            raise e
+        self._record_success()
+        return result
+    
+    async def acall(self, func, *args, **kwargs):
+        """call() for coroutine functions"""
+        self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self._record_failure()
+            raise e
+        self._record_success()
+        return result
+    
+    def _before_call(self):
+        # Closed (the common case) reads no clock unless the call fails
         if self.state == "open":
-            if datetime.utcnow() - self.last_failure_time > timedelta(seconds=self.timeout):
+            if time.monotonic() - self.last_failure_time > self.timeout:
                 self.state = "half_open"
                 logger.info("Circuit breaker entering half-open state")
             else:
                 raise Exception("Circuit breaker is OPEN - LLM service unavailable")
-        
-        try:
-            result = func(*args, **kwargs)
-            if self.state == "half_open":
-                self.state = "closed"
-                self.failures = 0
-                logger.info("Circuit breaker closed - service recovered")
-            return result
-        except Exception as e:
-            self.failures += 1
-            self.last_failure_time = datetime.utcnow()
-            if self.failures >= self.failure_threshold:
-                self.state = "open"
-                logger.error(f"Circuit breaker OPENED after {self.failures} failures")
-            raise e
+    
+    def _record_failure(self):
+        self.failures += 1
+        self.last_failure_time = time.monotonic()
+        if self.failures >= self.failure_threshold:
+            self.state = "open"
+            logger.error(f"Circuit breaker OPENED after {self.failures} failures")
+    
+    def _record_success(self):
+        if self.state == "half_open":
+            self.state = "closed"
+            self.failures = 0
+            logger.info("Circuit breaker closed - service recovered")
 
 # Global circuit breaker instance
 circuit_breaker = CircuitBreaker(failure_threshold=5, timeout=60)
@@ -79,39 +102,169 @@ chat_model = ChatOpenAI(
     max_retries=0  # We handle retries manually for better control
 )
 
+# System prompts repeat across turns, so their message objects are reused
+_system_messages: "OrderedDict[str, SystemMessage]" = OrderedDict()
+_system_messages_lock = threading.Lock()  # callers run on many threadpool threads
+_SYSTEM_MESSAGE_CACHE_SIZE = 256
+
+
+def _system_message(content: str) -> SystemMessage:
+    with _system_messages_lock:
+        message = _system_messages.get(content)
+        if message is None:
+            message = _system_messages[content] = SystemMessage(content=content)
+            if len(_system_messages) > _SYSTEM_MESSAGE_CACHE_SIZE:
+                _system_messages.popitem(last=False)
+        else:
+            _system_messages.move_to_end(content)
+    return message
+
+
+# OpenAI role -> message factory (system prompts come from the cache above)
+_MESSAGE_FACTORIES = {
+    "system": _system_message,
+    "user": lambda content: HumanMessage(content=content),
+    "assistant": lambda content: AIMessage(content=content),
+}
+
+
 def convert_to_langchain_messages(messages: list) -> List:
-    """Convert OpenAI-style messages to LangChain message objects with validation"""
+    """Convert OpenAI-style messages to LangChain message objects with validation
+    
+    LangChain message objects are passed through unchanged.
+    """
     if not messages:
         raise ValueError("Messages list cannot be empty")
     
     langchain_messages = []
+    append = langchain_messages.append
     for msg in messages:
-        if not isinstance(msg, dict):
-            logger.warning(f"Skipping invalid message format: {msg}")
-            continue
+        if isinstance(msg, dict):
+            content = msg.get("content")
+            if not content:
+                logger.warning(f"Skipping message with empty content: {msg}")
+                continue
             
-        role = msg.get("role")
-        content = msg.get("content")
-        
-        if not content:
-            logger.warning(f"Skipping message with empty content: {msg}")
-            continue
-        
-        if role == "system":
-            langchain_messages.append(SystemMessage(content=content))
-        elif role == "user":
-            langchain_messages.append(HumanMessage(content=content))
-        elif role == "assistant":
-            langchain_messages.append(AIMessage(content=content))
+            factory = _MESSAGE_FACTORIES.get(msg.get("role"))
+            if factory is None:
+                logger.warning(f"Unknown role '{msg.get('role')}', treating as user message")
+                factory = _MESSAGE_FACTORIES["user"]
+            append(factory(content))
+        elif isinstance(msg, BaseMessage):
+            append(msg)
         else:
-            logger.warning(f"Unknown role '{role}', treating as user message")
-            langchain_messages.append(HumanMessage(content=content))
+            logger.warning(f"Skipping invalid message format: {msg}")
     
     if not langchain_messages:
         raise ValueError("No valid messages after conversion")
     
     return langchain_messages
 
+def _retry_delay(error: Exception, attempt: int, max_retries: int) -> Optional[float]:
+    """Log a failed attempt and pick the backoff before the next one
+    
+    Returns:
+        Seconds to wait (0 after the last attempt), or None if the error is
+        not worth retrying
+    """
+    error_type = type(error).__name__
+    logger.warning(
+        f"LLM call failed on attempt {attempt + 1}/{max_retries}: {error_type} - {str(error)}"
+    )
+    
+    # Don't retry on certain errors
+    if "authentication" in str(error).lower() or "api key" in str(error).lower():
+        logger.error("Authentication error - not retrying")
+        return None
+    
+    if attempt < max_retries - 1:
+        # Exponential backoff with independent per-process jitter (0.5x-1.5x),
+        # so workers failing together do not retry in lockstep
+        sleep_time = (2 ** attempt) * (0.5 + random.random())
+        logger.info(f"Retrying in {sleep_time:.2f} seconds...")
+        return sleep_time
+    return 0.0
+
+
+def _response_content(response) -> str:
+    """Validated text of a chat model response"""
+    if not response or not hasattr(response, 'content'):
+        raise ValueError("Invalid response from LLM")
+    
+    if not response.content or not response.content.strip():
+        raise ValueError("Empty response from LLM")
+    
+    return response.content
+
+
+def _first_content(stream) -> str:
+    """Pull chunks until one has content; connection and server errors surface here"""
+    for chunk in stream:
+        if chunk.content:
+            return chunk.content
+    raise ValueError("Empty response from LLM")
+
+
+def _prepare_messages(messages: list, fallback_response: Optional[str]) -> Optional[List]:
+    """Validate and convert messages for the chat model
+    
+    Returns:
+        LangChain messages, or None when they are unusable and a fallback
+        response should be returned instead
+    
+    Raises:
+        ValueError: If the messages are unusable and no fallback was given
+    """
+    if not messages:
+        logger.error("Empty messages list provided to LLM")
+        if fallback_response:
+            return None
+        raise ValueError("Messages list cannot be empty")
+    
+    try:
+        return convert_to_langchain_messages(messages)
+    except ValueError as e:
+        logger.error(f"Message conversion failed: {e}")
+        if fallback_response:
+            return None
+        raise
+
+
+def _call_config(run_name: str, temperature: float, attempt: int) -> Dict[str, Any]:
+    """LangSmith run config for one attempt"""
+    return {
+        "run_name": run_name,
+        "temperature": temperature,
+        "tags": [f"attempt_{attempt + 1}", "multi_agent_system"]
+    }
+
+
+def _retries_exhausted(
+    what: str,
+    max_retries: int,
+    last_error: Optional[Exception],
+    fallback_response: Optional[str]
+) -> str:
+    """Log the final failure and return the fallback response
+    
+    Raises:
+        Exception: If no fallback response was given
+    """
+    logger.error(f"{what} failed after {max_retries} attempts. Last error: {last_error}")
+    
+    if fallback_response:
+        logger.info("Returning fallback response")
+        return fallback_response
+    
+    raise Exception(
+        f"LLM call failed after {max_retries} attempts: {str(last_error)}"
+    )
+
+
+def _assistant_message(content: str) -> Dict[Any, Any]:
+    return {"content": content, "role": "assistant"}
+
+
 def call_llm_with_retry(
     messages: list, 
     max_retries: int = 3, 
@@ -134,20 +287,9 @@ def call_llm_with_retry(
     Raises:
         Exception: If all retries fail and no fallback provided
     """
-    if not messages:
-        logger.error("Empty messages list provided to LLM")
-        if fallback_response:
-            return {"content": fallback_response, "role": "assistant"}
-        raise ValueError("Messages list cannot be empty")
-    
-    # Validate and convert messages
-    try:
-        langchain_messages = convert_to_langchain_messages(messages)
-    except ValueError as e:
-        logger.error(f"Message conversion failed: {e}")
-        if fallback_response:
-            return {"content": fallback_response, "role": "assistant"}
-        raise
+    langchain_messages = _prepare_messages(messages, fallback_response)
+    if langchain_messages is None:
+        return _assistant_message(fallback_response)
     
     last_error = None
     
@@ -157,51 +299,116 @@ def call_llm_with_retry(
             response = circuit_breaker.call(
                 chat_model.invoke,
                 langchain_messages,
-                config={
-                    "run_name": run_name or "llm_call", 
-                    "temperature": temperature,
-                    "tags": [f"attempt_{attempt + 1}", "multi_agent_system"]
-                }
+                config=_call_config(run_name or "llm_call", temperature, attempt)
             )
             
-            # Validate response
-            if not response or not hasattr(response, 'content'):
-                raise ValueError("Invalid response from LLM")
-            
-            if not response.content or not response.content.strip():
-                raise ValueError("Empty response from LLM")
+            content = _response_content(response)
             
             logger.info(f"LLM call successful on attempt {attempt + 1}")
-            return {
-                "content": response.content,
-                "role": "assistant"
-            }
+            return _assistant_message(content)
             
         except Exception as e:
             last_error = e
-            error_type = type(e).__name__
-            logger.warning(
-                f"LLM call failed on attempt {attempt + 1}/{max_retries}: {error_type} - {str(e)}"
+            delay = _retry_delay(e, attempt, max_retries)
+            if delay is None:
+                break
+            if delay:
+                time.sleep(delay)
+    
+    return _assistant_message(
+        _retries_exhausted("LLM call", max_retries, last_error, fallback_response)
+    )
+
+
+async def acall_llm_with_retry(
+    messages: list, 
+    max_retries: int = 3, 
+    temperature: float = 0.7, 
+    run_name: Optional[str] = None,
+    fallback_response: Optional[str] = None
+) -> Dict[Any, Any]:
+    """Async call_llm_with_retry: awaits the model and backs off with
+    asyncio.sleep, so the event loop keeps serving requests during retries
+    
+    Same arguments, return value and errors as call_llm_with_retry.
+    """
+    langchain_messages = _prepare_messages(messages, fallback_response)
+    if langchain_messages is None:
+        return _assistant_message(fallback_response)
+    
+    last_error = None
+    
+    for attempt in range(max_retries):
+        try:
+            response = await circuit_breaker.acall(
+                chat_model.ainvoke,
+                langchain_messages,
+                config=_call_config(run_name or "llm_call", temperature, attempt)
             )
             
-            # Don't retry on certain errors
-            if "authentication" in str(e).lower() or "api key" in str(e).lower():
-                logger.error("Authentication error - not retrying")
-                break
+            content = _response_content(response)
+            
+            logger.info(f"LLM call successful on attempt {attempt + 1}")
+            return _assistant_message(content)
             
-            if attempt < max_retries - 1:
-                # Exponential backoff with jitter
-                sleep_time = (2 ** attempt) + (time.time() % 1)  # Add jitter
-                logger.info(f"Retrying in {sleep_time:.2f} seconds...")
-                time.sleep(sleep_time)
+        except Exception as e:
+            last_error = e
+            delay = _retry_delay(e, attempt, max_retries)
+            if delay is None:
+                break
+            if delay:
+                await asyncio.sleep(delay)
     
-    # All retries failed
-    logger.error(f"LLM call failed after {max_retries} attempts. Last error: {last_error}")
+    return _assistant_message(
+        _retries_exhausted("LLM call", max_retries, last_error, fallback_response)
+    )
+
+def call_llm_with_retry_stream(
+    messages: list, 
+    max_retries: int = 3, 
+    temperature: float = 0.7, 
+    run_name: Optional[str] = None,
+    fallback_response: Optional[str] = None
+) -> Iterator[str]:
+    """Streaming variant of call_llm_with_retry: yields content chunks as they arrive
     
-    if fallback_response:
-        logger.info("Returning fallback response")
-        return {"content": fallback_response, "role": "assistant"}
+    Retries and the circuit breaker apply until the first chunk is received;
+    an error after that is raised to the caller mid-stream.
     
-    raise Exception(
-        f"LLM call failed after {max_retries} attempts: {str(last_error)}"
-    )
+    Yields:
+        Response text chunks (or fallback_response once if all retries fail)
+    
+    Raises:
+        Exception: If all retries fail and no fallback provided
+    """
+    langchain_messages = _prepare_messages(messages, fallback_response)
+    if langchain_messages is None:
+        yield fallback_response
+        return
+    
+    last_error = None
+    
+    for attempt in range(max_retries):
+        try:
+            stream = chat_model.stream(
+                langchain_messages,
+                config=_call_config(run_name or "llm_stream", temperature, attempt)
+            )
+            first = circuit_breaker.call(_first_content, stream)
+        except Exception as e:
+            last_error = e
+            delay = _retry_delay(e, attempt, max_retries)
+            if delay is None:
+                break
+            if delay:
+                time.sleep(delay)
+            continue
+        
+        logger.info(f"LLM stream started on attempt {attempt + 1}")
+        yield first
+        for chunk in stream:
+            if chunk.content:
+                yield chunk.content
+        return
+    
+    yield _retries_exhausted("LLM stream", max_retries, last_error, fallback_response)
@@ -5,13 +5,13 @@ Tests LLM's ability to understand Arabic across different dialects
 import pytest
 from src.services.intent_detection import IntentDetection
 from src.models.enums import IntentType, Sentiment
-from src.models.db_session import SessionLocal
+
+# These tests exercise the classifier itself
+pytestmark = pytest.mark.real_nlu
 
 @pytest.fixture
-def db():
-    db = SessionLocal()
-    yield db
-    db.close()
+def db(seeded_db_session):
+    return seeded_db_session
 
 @pytest.fixture
 def intent_service(db):
@@ -6,13 +6,10 @@ import pytest
 from src.services.issue_resolution_agent import IssueResolutionAgent
 from src.models.database import Order, Customer
 from src.models.enums import IssueType, Sentiment
-from src.models.db_session import SessionLocal
 
 @pytest.fixture
-def db():
-    db = SessionLocal()
-    yield db
-    db.close()
+def db(seeded_db_session):
+    return seeded_db_session
 
 @pytest.fixture
 def issue_agent(db):
@@ -38,7 +35,7 @@ def test_order(db):
         fulfillment_type="delivery"
     )
     db.add(order)
-    db.commit()
+    db.flush()
     
     return order
 
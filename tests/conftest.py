@@ -0,0 +1,124 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from src.data.seed_data import generate_menu_items, generate_faqs
+from src.models.database import Base
+from src.models.enums import IntentType, Sentiment
+from src.models.schemas import IntentResult
+from src.services.intent_detection import IntentDetection
+
+# Intents for the fixed messages the orchestrator tests send, so tests that
+# exercise routing do not wait on the LLM classifier
+_CANNED_INTENTS = {
+    "Hello": (IntentType.GREETING, 0.95),
+    "مرحبا": (IntentType.GREETING, 0.95),
+    "السلام عليكم": (IntentType.GREETING, 0.95),
+    "I want to order a burger": (IntentType.ORDERING, 0.95),
+    "أريد برجر": (IntentType.ORDERING, 0.95),
+    "أريد برجر من فضلك": (IntentType.ORDERING, 0.95),
+    "عايز أطلب": (IntentType.ORDERING, 0.9),
+    "أريد طعام": (IntentType.ORDERING, 0.9),
+    "What vegan options do you have?": (IntentType.INQUIRY, 0.95),
+    "What are your hours?": (IntentType.INQUIRY, 0.95),
+    "عندكم أكل نباتي؟": (IntentType.INQUIRY, 0.95),
+    "وين المنيو؟": (IntentType.INQUIRY, 0.9),
+    "الطلب جاني ناقص": (IntentType.COMPLAINT, 0.95),
+    "مممم": (IntentType.UNCLEAR, 0.3),
+}
+
+
+def _create_engine():
+    """In-memory database with the schema, usable from any thread
+
+    Each process gets its own, so pytest-xdist workers never share state.
+    """
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False}
+    )
+
+    # pysqlite's own transaction handling breaks SAVEPOINT; let SQLAlchemy
+    # emit BEGIN itself (SQLAlchemy's documented SQLite savepoint recipe)
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        # Nothing here needs durability; keep sorter/temp-index spills off
+        # disk too (an in-memory database already journals in memory)
+        dbapi_connection.execute("PRAGMA synchronous=OFF")
+        dbapi_connection.execute("PRAGMA temp_store=MEMORY")
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _rolled_back_session(engine):
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    yield session
+
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """One empty in-memory database per test session; the schema is created once"""
+    engine = _create_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def seeded_engine():
+    """Separate in-memory database with the menu and FAQ seed data, inserted once"""
+    engine = _create_engine()
+    with Session(engine) as session:
+        generate_menu_items(session)
+        generate_faqs(session)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    """Session inside a transaction that is rolled back after the test
+
+    Commits made by the code under test only release savepoints, so every test
+    starts from the same database state.
+    """
+    yield from _rolled_back_session(engine)
+
+
+@pytest.fixture
+def seeded_db_session(seeded_engine):
+    """db_session over the seeded database"""
+    yield from _rolled_back_session(seeded_engine)
+
+
+@pytest.fixture(autouse=True)
+def fake_nlu(request, monkeypatch):
+    """Answer intent detection for known test messages from _CANNED_INTENTS
+
+    Other messages, and tests marked real_nlu, go to the real classifier.
+    """
+    if request.node.get_closest_marker("real_nlu"):
+        return
+    real_detect = IntentDetection.detect
+
+    def detect(self, message, conversation_history=None, session_context=None):
+        canned = _CANNED_INTENTS.get(message)
+        if canned is None:
+            return real_detect(self, message, conversation_history, session_context)
+        intent, confidence = canned
+        return IntentResult(intent=intent, confidence=confidence, entities={}, sentiment=Sentiment.NEUTRAL)
+
+    monkeypatch.setattr(IntentDetection, "detect", detect)
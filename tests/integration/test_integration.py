@@ -1,30 +1,18 @@
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.models.database import Base, Customer, MenuItem, FAQ
+from src.models.database import Customer, MenuItem, FAQ, AuditLog
 from src.services.orchestrator import ConversationOrchestrator
-from src.data.seed_data import generate_menu_items, generate_faqs, generate_customers
 
 @pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    SessionLocal = sessionmaker(bind=engine)
-    session = SessionLocal()
-    
-    generate_menu_items(session)
-    generate_faqs(session)
-    
+def db_session(seeded_db_session):
     customer = Customer(
         name="Test Customer",
         phone="+15555555555",
         email="test@example.com"
     )
-    session.add(customer)
-    session.commit()
+    seeded_db_session.add(customer)
+    seeded_db_session.flush()
     
-    yield session
-    session.close()
+    yield seeded_db_session
 
 def test_greeting_flow(db_session):
     orchestrator = ConversationOrchestrator(db_session)
@@ -69,3 +57,19 @@ def test_order_flow(db_session):
     
     assert response is not None
     assert "burger" in response.response.lower() or "order" in response.response.lower()
+
+def test_failed_turn_keeps_queued_audit_events(db_session, monkeypatch):
+    orchestrator = ConversationOrchestrator(db_session)
+    
+    def fail_after_queueing(message, session, language):
+        orchestrator.audit_logger.enqueue(action="escalated_to_human", customer_id=session.customer_id)
+        raise RuntimeError("handler failed")
+    
+    monkeypatch.setattr(orchestrator, "_process_simple_query", fail_after_queueing)
+    response = orchestrator.process_message(
+        message="Hello",
+        customer_phone="+15555555555"
+    )
+    
+    assert response.intent == "unclear"
+    assert db_session.query(AuditLog).filter(AuditLog.action == "escalated_to_human").count() == 1
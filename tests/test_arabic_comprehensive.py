@@ -3,31 +3,49 @@ Consolidated Arabic Language Tests
 Tests all 4 priority agents with Arabic natural language
 """
 import pytest
+from sqlalchemy.orm import Session
 from src.services.orchestrator import ConversationOrchestrator
 from src.services.order_processing_agent import OrderProcessingAgent
 from src.services.issue_resolution_agent import IssueResolutionAgent
 from src.services.menu_agent import MenuAgent
 from src.services.context_manager import ContextManager
-from src.models.db_session import SessionLocal
 from src.models.database import Customer
 from src.models.enums import IntentType
 
+@pytest.fixture(scope="class")
+def class_connection(seeded_engine):
+    """Connection whose outer transaction holds the rows a test class shares"""
+    connection = seeded_engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+@pytest.fixture(scope="class")
+def customer(class_connection):
+    """Customer inserted once per class; only its id and phone are read"""
+    with Session(
+        bind=class_connection,
+        join_transaction_mode="create_savepoint",
+        expire_on_commit=False
+    ) as session:
+        customer = Customer(
+            name="Ahmed Test",
+            phone="+966501234567",
+            email="ahmed@test.sa"
+        )
+        session.add(customer)
+        session.commit()
+    return customer
+
 @pytest.fixture
-def db():
-    session = SessionLocal()
+def db(class_connection):
+    """Per-test session on the class connection; its writes are rolled back afterwards"""
+    savepoint = class_connection.begin_nested()
+    session = Session(bind=class_connection, join_transaction_mode="create_savepoint")
     yield session
     session.close()
-
-@pytest.fixture
-def customer(db):
-    customer = Customer(
-        name="Ahmed Test",
-        phone="+966501234567",
-        email="ahmed@test.sa"
-    )
-    db.add(customer)
-    db.commit()
-    return customer
+    savepoint.rollback()
 
 class TestArabicOrchestrator:
     """Test orchestrator with Arabic inputs"""
@@ -77,35 +95,22 @@ class TestArabicOrchestrator:
 class TestArabicOrderProcessing:
     """Test order processing with Arabic items"""
     
-    def test_single_arabic_item(self, db, customer):
-        agent = OrderProcessingAgent(db)
-        context_manager = ContextManager(db)
-        session = context_manager.get_or_create_session(customer.phone)
-        
-        result = agent.process_order_request("أريد برجر", session, {"items": ["برجر"]})
-        
-        assert result["success"] == True
-        assert "طلبك" in result["message"]
-        assert "burger" in result["message"].lower() or "برجر" in result["message"]
-    
-    def test_multiple_arabic_items(self, db, customer):
-        agent = OrderProcessingAgent(db)
-        context_manager = ContextManager(db)
-        session = context_manager.get_or_create_session(customer.phone)
-        
-        result = agent.process_order_request("بدي بيتزا وبطاطس", session, {"items": ["بيتزا", "بطاطس"]})
-        
-        assert result["success"] == True
-        assert "طلبك" in result["message"]
-    
-    def test_mixed_arabic_english(self, db, customer):
+    # expected: groups of alternatives, one of each must appear in the reply
+    @pytest.mark.parametrize("message, items, expected", [
+        ("أريد برجر", ["برجر"], [("طلبك",), ("burger", "برجر")]),
+        ("بدي بيتزا وبطاطس", ["بيتزا", "بطاطس"], [("طلبك",)]),
+        ("أريد burger وfries", ["burger", "fries"], []),
+    ], ids=["single_item", "multiple_items", "mixed_arabic_english"])
+    def test_arabic_items(self, db, customer, message, items, expected):
         agent = OrderProcessingAgent(db)
         context_manager = ContextManager(db)
         session = context_manager.get_or_create_session(customer.phone)
         
-        result = agent.process_order_request("أريد burger وfries", session, {"items": ["burger", "fries"]})
+        result = agent.process_order_request(message, session, {"items": items})
         
         assert result["success"] == True
+        for alternatives in expected:
+            assert any(term in result["message"].lower() for term in alternatives)
     
     def test_different_dialects(self, db, customer):
         agent = OrderProcessingAgent(db)
@@ -168,6 +173,7 @@ class TestArabicMenuAgent:
         # Should either find salad or give helpful response
         assert response is not None
 
+@pytest.mark.real_nlu
 class TestArabicEndToEnd:
     """End-to-end Arabic conversation flow"""
     
@@ -0,0 +1,23 @@
+from src.utils.arabic import keyword_pattern, normalize_arabic
+
+def test_normalize_arabic_unifies_spelling_variants():
+    assert normalize_arabic("متأخر") == normalize_arabic("متاخر")
+    assert normalize_arabic("إضافة") == "اضافه"
+    assert normalize_arabic("شكراً") == "شكرا"
+    assert normalize_arabic("بـــرجر") == "برجر"
+    assert normalize_arabic("  Cheese Burger ") == "cheese burger"
+
+def test_keyword_pattern_matches_any_keyword_literally():
+    pattern = keyword_pattern("remove", "a.b", "how much")
+
+    assert pattern.search("please remove the fries")
+    assert pattern.search("how much is it")
+    # Keywords are escaped, not treated as regex syntax
+    assert pattern.search("a.b")
+    assert not pattern.search("axb")
+
+def test_keyword_pattern_normalizes_keywords():
+    assert keyword_pattern("متأخر").search(normalize_arabic("الطلب متاخر")) is None
+    pattern = keyword_pattern("متأخر", "Late", normalize=True)
+    assert pattern.search(normalize_arabic("الطلب مُتأخر"))
+    assert pattern.search(normalize_arabic("Order is LATE"))
@@ -1,18 +1,7 @@
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.models.database import Base, AuditLog
+from src.models.database import AuditLog
 from src.services.audit_logger import AuditLogger
 
-@pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    SessionLocal = sessionmaker(bind=engine)
-    session = SessionLocal()
-    yield session
-    session.close()
-
 def test_log_action(db_session):
     logger = AuditLogger(db_session)
     customer_id = "test-customer-id"
@@ -42,3 +31,35 @@ def test_log_warning(db_session):
     
     logs = db_session.query(AuditLog).filter(AuditLog.severity == "warning").all()
     assert len(logs) == 1
+
+def test_log_without_commit(db_session):
+    logger = AuditLogger(db_session)
+    
+    logger.log(action="escalated_to_human", commit=False)
+    db_session.rollback()
+    assert db_session.query(AuditLog).count() == 0
+    
+    logger.log(action="escalated_to_human", commit=False)
+    db_session.commit()
+    assert db_session.query(AuditLog).filter(AuditLog.action == "escalated_to_human").count() == 1
+
+def test_enqueue_and_flush(db_session):
+    logger = AuditLogger(db_session)
+    
+    logger.enqueue(action="escalated_to_human", customer_id="c1")
+    logger.enqueue(action="auto_escalated_on_error", customer_id="c1")
+    assert db_session.query(AuditLog).count() == 0
+    
+    assert logger.flush() == 2
+    assert db_session.query(AuditLog).count() == 2
+    assert logger.flush() == 0
+
+def test_enqueue_flushes_at_max_pending(db_session):
+    logger = AuditLogger(db_session, max_pending=2)
+    
+    logger.enqueue(action="escalated_to_human")
+    assert db_session.query(AuditLog).count() == 0
+    
+    logger.enqueue(action="auto_escalated_on_error")
+    assert db_session.query(AuditLog).count() == 2
+    assert logger.flush() == 0
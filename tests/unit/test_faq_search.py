@@ -1,28 +1,19 @@
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.models.database import Base, FAQ
+from src.models.database import FAQ
 from src.services.faq_search import FAQSearch
 import json
 
 @pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    SessionLocal = sessionmaker(bind=engine)
-    session = SessionLocal()
+def db_session(db_session):
+    # One executemany instead of per-object unit-of-work flushes
+    db_session.execute(FAQ.__table__.insert(), [
+        {"question": "What are your hours?", "answer": "11am-10pm Mon-Fri", "category": "hours", "keywords": json.dumps(["hours", "open", "time"])},
+        {"question": "Do you deliver?", "answer": "Yes, within 5 miles", "category": "delivery", "keywords": json.dumps(["deliver", "delivery"])},
+        {"question": "What payment methods?", "answer": "Credit, debit, Apple Pay", "category": "payment", "keywords": json.dumps(["payment", "pay", "card"])},
+    ])
+    db_session.flush()
     
-    faqs = [
-        FAQ(question="What are your hours?", answer="11am-10pm Mon-Fri", category="hours", keywords=json.dumps(["hours", "open", "time"])),
-        FAQ(question="Do you deliver?", answer="Yes, within 5 miles", category="delivery", keywords=json.dumps(["deliver", "delivery"])),
-        FAQ(question="What payment methods?", answer="Credit, debit, Apple Pay", category="payment", keywords=json.dumps(["payment", "pay", "card"])),
-    ]
-    for faq in faqs:
-        session.add(faq)
-    session.commit()
-    
-    yield session
-    session.close()
+    yield db_session
 
 def test_search_by_keyword(db_session):
     faq_search = FAQSearch(db_session)
@@ -0,0 +1,11 @@
+import json
+from src.utils import json_codec
+
+def test_round_trip_keeps_arabic_unescaped():
+    draft = {"items": [{"name": "برجر", "quantity": 2, "price": 8.99}], "total": 17.98}
+    
+    serialized = json_codec.dumps(draft)
+    assert isinstance(serialized, str)
+    assert "برجر" in serialized
+    assert json_codec.loads(serialized) == draft
+    assert json.loads(serialized) == draft
@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from src.utils import llm_helpers
+from src.utils.llm_helpers import CircuitBreaker
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class StubChatModel:
+    """Chat model double: each call takes the next outcome (an Exception to raise or a reply)"""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def invoke(self, messages, config=None):
+        return SimpleNamespace(content=self._next())
+
+    async def ainvoke(self, messages, config=None):
+        return self.invoke(messages, config)
+
+    def stream(self, messages, config=None):
+        # Errors surface while iterating, like a real streaming response
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        for chunk in outcome:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield SimpleNamespace(content=chunk)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, timeout=60)
+    monkeypatch.setattr(llm_helpers, "circuit_breaker", breaker)
+    monkeypatch.setattr(llm_helpers.time, "sleep", lambda seconds: None)
+    return breaker
+
+
+def use_model(monkeypatch, model):
+    monkeypatch.setattr(llm_helpers, "chat_model", model)
+    return model
+
+
+def test_retries_up_to_max_retries(monkeypatch, breaker):
+    breaker.failure_threshold = 10
+    model = use_model(monkeypatch, StubChatModel(ConnectionError("reset")))
+
+    with pytest.raises(Exception, match="failed after 3 attempts"):
+        llm_helpers.call_llm_with_retry(MESSAGES, max_retries=3)
+    assert model.calls == 3
+
+    assert llm_helpers.call_llm_with_retry(MESSAGES, max_retries=2, fallback_response="sorry")["content"] == "sorry"
+    assert model.calls == 5
+
+def test_async_retries_without_blocking_sleep(monkeypatch, breaker):
+    async def no_sleep(seconds):
+        pass
+    monkeypatch.setattr(llm_helpers.asyncio, "sleep", no_sleep)
+    model = use_model(monkeypatch, StubChatModel(ConnectionError("reset"), "hello"))
+
+    result = asyncio.run(llm_helpers.acall_llm_with_retry(MESSAGES, max_retries=3))
+    assert result["content"] == "hello"
+    assert model.calls == 2
+
+def test_succeeds_after_transient_failure(monkeypatch, breaker):
+    model = use_model(monkeypatch, StubChatModel(ConnectionError("reset"), "hello"))
+
+    assert llm_helpers.call_llm_with_retry(MESSAGES) == {"content": "hello", "role": "assistant"}
+    assert model.calls == 2
+
+def test_authentication_error_is_not_retried(monkeypatch, breaker):
+    model = use_model(monkeypatch, StubChatModel(RuntimeError("Invalid API key provided")))
+
+    with pytest.raises(Exception):
+        llm_helpers.call_llm_with_retry(MESSAGES, max_retries=3)
+    assert model.calls == 1
+
+def test_circuit_breaker_opens_then_half_opens(monkeypatch, breaker):
+    model = use_model(monkeypatch, StubChatModel(ConnectionError("down"), ConnectionError("down"), "back"))
+
+    with pytest.raises(Exception):
+        llm_helpers.call_llm_with_retry(MESSAGES, max_retries=2)
+    assert breaker.state == "open"
+
+    # Open: calls are rejected without reaching the model
+    with pytest.raises(Exception):
+        llm_helpers.call_llm_with_retry(MESSAGES, max_retries=1)
+    assert model.calls == 2
+
+    # After the timeout one trial call goes through and closes the circuit
+    breaker.last_failure_time -= breaker.timeout + 1
+    assert llm_helpers.call_llm_with_retry(MESSAGES, max_retries=1)["content"] == "back"
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+def test_stream_retries_only_before_first_chunk(monkeypatch, breaker):
+    model = use_model(monkeypatch, StubChatModel(
+        [ConnectionError("reset")],
+        ["a", "b", ConnectionError("dropped mid-stream")]
+    ))
+
+    received = []
+    with pytest.raises(ConnectionError, match="mid-stream"):
+        for chunk in llm_helpers.call_llm_with_retry_stream(MESSAGES, max_retries=3):
+            received.append(chunk)
+    assert received == ["a", "b"]
+    assert model.calls == 2
+
+def test_empty_messages_use_fallback(monkeypatch, breaker):
+    model = use_model(monkeypatch, StubChatModel("unused"))
+
+    assert llm_helpers.call_llm_with_retry([], fallback_response="sorry")["content"] == "sorry"
+    assert list(llm_helpers.call_llm_with_retry_stream([], fallback_response="sorry")) == ["sorry"]
+    with pytest.raises(ValueError):
+        llm_helpers.call_llm_with_retry([])
+    assert model.calls == 0
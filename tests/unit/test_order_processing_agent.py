@@ -0,0 +1,108 @@
+import random
+import pytest
+from src.models.database import MenuItem
+from src.services.order_processing_agent import OrderProcessingAgent, _SubstringIndex, _iter_json_objects, clear_menu_match_cache
+
+@pytest.fixture
+def agent():
+    # The helpers under test use no DB session or LLM, so skip __init__
+    return OrderProcessingAgent.__new__(OrderProcessingAgent)
+
+def naive_first_containing(names, query):
+    return next((idx for idx, name in enumerate(names) if name is not None and query in name), None)
+
+def naive_first_contained_in(names, query):
+    return next((idx for idx, name in enumerate(names) if name is not None and name in query), None)
+
+def test_substring_index_lookups():
+    index = _SubstringIndex.build(("classic burger", None, "fries", "burger", "fries"))
+
+    assert index.first_containing("burger") == 0
+    assert index.first_containing("ies") == 2
+    assert index.first_containing("pizza") is None
+    # A query cannot match across the boundary between two names
+    assert index.first_containing("burgerfries") is None
+
+    assert index.first_contained_in("large fries and a burger") == 2
+    assert index.first_contained_in("a classic burger please") == 0
+    assert index.first_contained_in("salad") is None
+
+def test_substring_index_empty_column():
+    index = _SubstringIndex.build((None, None))
+
+    assert index.first_containing("burger") is None
+    assert index.first_contained_in("burger") is None
+
+def test_substring_index_matches_naive_scan():
+    rng = random.Random(1234)
+    alphabet = "ab cب"
+
+    def word(max_len):
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+
+    for _ in range(2000):
+        names = tuple(rng.choice([None, word(4)]) for _ in range(rng.randint(0, 8)))
+        index = _SubstringIndex.build(names)
+        query = word(6)
+
+        assert index.first_containing(query) == naive_first_containing(names, query), (names, query)
+        assert index.first_contained_in(query) == naive_first_contained_in(names, query), (names, query)
+
+@pytest.mark.parametrize("items, expected", [
+    # 1.5 halalas of tax rounds half up to 2
+    ([{"price": 0.10, "quantity": 1}], {"subtotal": 0.10, "tax": 0.02, "total": 0.12}),
+    # 899.55 halalas of tax rounds up to 900
+    ([{"price": 19.99, "quantity": 3}], {"subtotal": 59.97, "tax": 9.00, "total": 68.97}),
+    # 0.29 * 100 is 28.999... in binary floating point; still 29 halalas
+    ([{"price": 0.29, "quantity": 1}, {"price": 12.5, "quantity": 2}], {"subtotal": 25.29, "tax": 3.79, "total": 29.08}),
+    ([], {"subtotal": 0.0, "tax": 0.0, "total": 0.0}),
+], ids=["half_up", "rounds_up", "float_price", "empty"])
+def test_calculate_totals(agent, items, expected):
+    totals = agent._calculate_totals(items)
+
+    assert totals == {**expected, "delivery_fee": 0.0}
+    # Computed in whole halalas, so the parts add up exactly
+    assert round(totals["subtotal"] * 100) + round(totals["tax"] * 100) == round(totals["total"] * 100)
+
+@pytest.mark.parametrize("text, expected", [
+    ('Sure! {"a": 1} and {"b": 2}', ['{"a": 1}', '{"b": 2}']),
+    ('{"outer": {"inner": [1, {"x": 2}]}} done', ['{"outer": {"inner": [1, {"x": 2}]}}']),
+    # Braces and escaped quotes inside strings do not change the depth
+    ('{"name": "burger }{ \\" deluxe"}', ['{"name": "burger }{ \\" deluxe"}']),
+    # Quotes outside any object do not start a string
+    ('He said "hi" {"a": "b"}', ['{"a": "b"}']),
+    ('stray } then {"a": 1}', ['{"a": 1}']),
+    ('{"unterminated": 1', []),
+    ("no json here", []),
+], ids=["several", "nested", "braces_in_strings", "quotes_outside", "stray_close", "unterminated", "none"])
+def test_iter_json_objects(text, expected):
+    assert list(_iter_json_objects(text)) == expected
+
+@pytest.mark.parametrize("content, expected", [
+    ('[{"name": "burger", "quantity": 2}]', [{"name": "burger", "quantity": 2}]),
+    # Trailing commas are stripped
+    ('[{"name": "burger", "quantity": 2,},]', [{"name": "burger", "quantity": 2}]),
+    # Single quotes are swapped when there are no double quotes
+    ("[{'name': 'burger', 'quantity': 1}]", [{"name": "burger", "quantity": 1}]),
+    # Mixed quotes fall through to the Python literal parser
+    ("[{'name': \"burger\", 'quantity': 1},]", [{"name": "burger", "quantity": 1}]),
+    ("[{'name': 'fries', 'large': True}]", [{"name": "fries", "large": True}]),
+    ("not json at all", None),
+], ids=["strict", "trailing_commas", "single_quotes", "mixed_quotes", "python_literal", "unparseable"])
+def test_parse_item_array(agent, content, expected):
+    assert agent._parse_item_array(content) == expected
+
+def test_clear_menu_match_cache_drops_unavailable_items(seeded_db_session):
+    item = seeded_db_session.query(MenuItem).filter(MenuItem.is_available == True).first()
+    agent = OrderProcessingAgent(seeded_db_session)
+    clear_menu_match_cache()
+
+    match, _ = agent._find_menu_item(item.name)
+    assert match.id == item.id
+
+    item.is_available = False
+    seeded_db_session.flush()
+    clear_menu_match_cache()
+
+    match, _ = agent._find_menu_item(item.name)
+    assert match is None or match.id != item.id
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+# Importing the service needs faster-whisper or openai-whisper
+voice_transcription = pytest.importorskip("src.services.voice_transcription")
+from src.services.voice_transcription import _VAD_FRAME, _has_speech, _upload_suffix
+
+SAMPLE_RATE = 16000
+
+
+def tone(n_samples, amplitude=0.1):
+    t = np.arange(n_samples, dtype=np.float32) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def test_has_speech_rejects_silence():
+    assert not _has_speech(np.zeros(SAMPLE_RATE, dtype=np.float32))
+    # Background noise well under the -40 dBFS threshold
+    noise = np.random.default_rng(0).normal(0, 0.001, SAMPLE_RATE).astype(np.float32)
+    assert not _has_speech(noise)
+
+def test_has_speech_accepts_tone():
+    assert _has_speech(tone(SAMPLE_RATE))
+
+def test_has_speech_needs_min_speech_frames():
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    audio[:2 * _VAD_FRAME] = tone(2 * _VAD_FRAME)
+    assert not _has_speech(audio)
+
+    audio[:3 * _VAD_FRAME] = tone(3 * _VAD_FRAME)
+    assert _has_speech(audio)
+
+def test_has_speech_shorter_than_one_frame():
+    assert not _has_speech(np.zeros(0, dtype=np.float32))
+    assert not _has_speech(tone(_VAD_FRAME - 1))
+
+@pytest.mark.parametrize("filename, expected", [
+    ("recording.webm", ".webm"),
+    ("Voice Note.M4A", ".m4a"),
+    ("clip.backup.mp4", ".mp4"),
+    (None, ".webm"),
+    ("", ".webm"),
+    ("recording", ".webm"),
+    ("recording.", ".webm"),
+], ids=["plain", "uppercase", "multiple_dots", "none", "empty", "no_extension", "trailing_dot"])
+def test_upload_suffix(filename, expected):
+    assert _upload_suffix(filename) == expected